@@ -12,15 +12,20 @@
 
 """bencode.py - bencode encoder + decoder."""
 
-from bencodepy.common import Bencached
+from bencodepy.cache import BencodeCache
+from bencodepy.common import Bencached, CompactDict
+from bencodepy.compression import sniff
 from bencodepy.decoder import BencodeDecoder
+from bencodepy.document import BencodeDocument
 from bencodepy.encoder import BencodeEncoder
+from bencodepy.events import decode_stream
 from bencodepy.exceptions import BencodeDecodeError
+from bencodepy.parallel import decode_parallel
 
 try:
-    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any, Optional
 except ImportError:
-    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = Optional = None
 
 try:
     from collections import OrderedDict
@@ -35,25 +40,37 @@ except ImportError:
 __all__ = (
     'Bencached',
     'Bencode',
+    'BencodeCache',
     'BencodeDecoder',
     'BencodeDecodeError',
+    'BencodeDocument',
     'BencodeEncoder',
+    'CompactDict',
     'bencode',
     'bdecode',
     'bread',
     'bwrite',
     'encode',
-    'decode'
+    'decode',
+    'decode_parallel'
 )
 
 
 class Bencode(object):
-    def __init__(self, encoding=None, encoding_fallback=None, dict_ordered=False, dict_ordered_sort=False):
+    def __init__(self, encoding=None, encoding_fallback=None, dict_ordered=False, dict_ordered_sort=False,
+                 compact=False, encoding_rules=None, max_depth=None, max_items=None, max_string_length=None,
+                 max_size=None):
         self.decoder = BencodeDecoder(
             encoding=encoding,
             encoding_fallback=encoding_fallback,
             dict_ordered=dict_ordered,
-            dict_ordered_sort=dict_ordered_sort
+            dict_ordered_sort=dict_ordered_sort,
+            compact=compact,
+            encoding_rules=encoding_rules,
+            max_depth=max_depth,
+            max_items=max_items,
+            max_string_length=max_string_length,
+            max_size=max_size
         )
 
         self.encoder = BencodeEncoder()
@@ -71,6 +88,39 @@ class Bencode(object):
         """
         return self.decoder.decode(value)
 
+    def try_decode(self, value):
+        # type: (bytes) -> Tuple[Any, Optional[BencodeDecodeError]]
+        """
+        Decode bencode formatted byte string ``value`` within the decoder resource budgets.
+
+        Exceptions aren't raised for invalid values.
+
+        :param value: Bencode formatted string
+        :type value: bytes
+
+        :return: ``(data, None)``, or ``(None, error)`` for invalid values
+        :rtype: tuple
+        """
+        return self.decoder.try_decode(value)
+
+    def decode_parallel(self, value, processes=None):
+        # type: (bytes, int) -> Union[Tuple, List, OrderedDict, bool, int, str, bytes]
+        """
+        Decode bencode formatted byte string ``value`` in parallel.
+
+        The children of the top-level container are decoded across ``processes`` worker processes.
+
+        :param value: Bencode formatted string
+        :type value: bytes
+
+        :param processes: Number of worker processes (or ``None`` for the CPU count)
+        :type processes: int
+
+        :return: Decoded value
+        :rtype: object
+        """
+        return decode_parallel(value, self.decoder, processes=processes)
+
     def encode(self, value):
         # type: (Union[Tuple, List, OrderedDict, Dict, bool, int, str, bytes]) -> bytes
         """
@@ -84,6 +134,22 @@ class Bencode(object):
         """
         return self.encoder.encode(value)
 
+    def digest(self, value, algorithm='sha1'):
+        # type: (Union[Tuple, List, OrderedDict, Dict, bool, int, str, bytes], Union[str, Tuple[str]]) -> bytes
+        """
+        Return the digest of ``value`` in the bencode format (without building the encoded output).
+
+        :param value: Value
+        :type value: object
+
+        :param algorithm: ``hashlib`` algorithm name, or tuple of names (to compute digests in a single pass)
+        :type algorithm: str or tuple
+
+        :return: Digest (or tuple of digests)
+        :rtype: bytes or tuple
+        """
+        return self.encoder.digest(value, algorithm)
+
     def read(self,
              fd  # type: Union[bytes, str, pathlib.Path, pathlib.PurePath, TextIO, BinaryIO]
              ):
@@ -93,15 +159,23 @@ class Bencode(object):
         if fd is a bytes/string or pathlib.Path-like object, it is opened and
         read, otherwise .read() is used. if read() not available, exception
         raised.
+
+        Compressed (gzip, bz2 and xz) data is detected by its magic bytes, and
+        is decoded incrementally from the decompressed output (in chunks).
         """
         if isinstance(fd, (bytes, str)):
             with open(fd, 'rb') as fd:
-                return self.decode(fd.read())
+                return self.read(fd)
         elif pathlib is not None and isinstance(fd, (pathlib.Path, pathlib.PurePath)):
             with open(str(fd), 'rb') as fd:
-                return self.decode(fd.read())
-        else:
-            return self.decode(fd.read())
+                return self.read(fd)
+
+        fd, kind = sniff(fd)
+
+        if kind is not None:
+            return decode_stream(fd, self.decoder)
+
+        return self.decode(fd.read())
 
     def write(self,
               data,  # type: Union[Tuple, List, OrderedDict, Dict, bool, int, str, bytes]
@@ -116,12 +190,12 @@ class Bencode(object):
         """
         if isinstance(fd, (bytes, str)):
             with open(fd, 'wb') as fd:
-                fd.write(self.encode(data))
+                self.encoder.encode_to(data, fd.write)
         elif pathlib is not None and isinstance(fd, (pathlib.Path, pathlib.PurePath)):
             with open(str(fd), 'wb') as fd:
-                fd.write(self.encode(data))
+                self.encoder.encode_to(data, fd.write)
         else:
-            fd.write(self.encode(data))
+            self.encoder.encode_to(data, fd.write)
 
 
 DEFAULT = Bencode()
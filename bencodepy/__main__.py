@@ -0,0 +1,7 @@
+"""bencode.py - command-line interface entry point."""
+
+from bencodepy.cli import main
+import sys
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""bencode.py - decoded file cache."""
+
+from bencodepy.compression import sniff
+from bencodepy.decoder import BencodeDecoder
+from bencodepy.events import decode_stream
+from collections import OrderedDict, namedtuple
+import hashlib
+import io
+import os
+import threading
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+try:
+    import pathlib
+except ImportError:
+    pathlib = None
+
+CACHE_KEY_TYPES = ('stat', 'digest')
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'entries', 'size'])
+
+
+def _copy(value):
+    """Copy decoded containers (strings and integers are immutable, and are shared)."""
+    t = type(value)
+
+    if t is list:
+        return [_copy(v) for v in value]
+
+    if t is dict:
+        return dict((k, _copy(v)) for k, v in value.items())
+
+    if t is OrderedDict:
+        return OrderedDict((k, _copy(v)) for k, v in value.items())
+
+    return value
+
+
+class BencodeCache(object):
+    def __init__(self, decoder=None, max_entries=128, max_size=None, key='stat', copy=None):
+        """Create a size-bounded LRU cache of decoded files.
+
+        :param decoder: Decoder (or ``None`` for a default decoder)
+        :type decoder: BencodeDecoder
+
+        :param max_entries: Maximum number of cached files
+        :type max_entries: int
+
+        :param max_size: Maximum total size (in bytes, of the encoded files), or ``None`` for no limit
+        :type max_size: int
+
+        :param key: Cache key for paths, ``stat`` (path, modification time and size) or ``digest`` (content digest,
+                    files are still read, but aren't decoded again), file objects are always keyed by digest
+        :type key: str
+
+        :param copy: Copy cached values on access, or ``None`` to copy only when the decoder produces mutable
+                     containers (i.e. without ``compact`` enabled)
+        :type copy: bool
+        """
+        if key not in CACHE_KEY_TYPES:
+            raise ValueError(
+                'Invalid value for "key" (expected "stat" or "digest")'
+            )
+
+        self.decoder = decoder or BencodeDecoder()
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.key = key
+
+        if copy is None:
+            copy = not self.decoder.compact
+
+        self.copy = copy
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self,
+             fd  # type: Union[bytes, str, pathlib.Path, pathlib.PurePath, TextIO, BinaryIO]
+             ):
+        # type: (...) -> Union[Tuple, List, OrderedDict, bool, int, str, bytes]
+        """Return bdecoded data from filename, file, or file-like object (using cached results when available).
+
+        if fd is a bytes/string or pathlib.Path-like object, it is opened and
+        read, otherwise .read() is used. if read() not available, exception
+        raised.
+        """
+        if pathlib is not None and isinstance(fd, (pathlib.Path, pathlib.PurePath)):
+            fd = str(fd)
+
+        data = None
+
+        if not isinstance(fd, (bytes, str)):
+            data = fd.read()
+            key = self._digest(data)
+        elif self.key == 'stat':
+            st = os.stat(fd)
+            key = (os.path.abspath(fd), getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size)
+        else:
+            with open(fd, 'rb') as fp:
+                data = fp.read()
+
+            key = self._digest(data)
+
+        # Find cached value
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                self._touch(key, entry)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is not None:
+            return self._result(entry[0])
+
+        # Decode file
+        if data is None:
+            with open(fd, 'rb') as fp:
+                data = fp.read()
+
+        # Compressed files are decoded from the decompressed stream (like :meth:`Bencode.read`)
+        fp, kind = sniff(io.BytesIO(data))
+
+        if kind is not None:
+            value = decode_stream(fp, self.decoder)
+        else:
+            value = self.decoder.decode(data)
+
+        with self._lock:
+            self._store(key, value, len(data))
+
+        return self._result(value)
+
+    def clear(self):
+        """Remove all cached values (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def info(self):
+        # type: () -> CacheInfo
+        """Return cache statistics."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, len(self._entries), self.size)
+
+    def _digest(self, data):
+        return hashlib.sha256(data).digest(), len(data)
+
+    def _result(self, value):
+        if self.copy:
+            return _copy(value)
+
+        return value
+
+    def _store(self, key, value, size):
+        if self.max_size is not None and size > self.max_size:
+            return
+
+        previous = self._entries.pop(key, None)
+
+        if previous is not None:
+            self.size -= previous[1]
+
+        self._entries[key] = (value, size)
+        self.size += size
+
+        # Evict least recently used values
+        while len(self._entries) > self.max_entries or (self.max_size is not None and self.size > self.max_size):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def _touch(self, key, entry):
+        try:
+            self._entries.move_to_end(key)
+        except AttributeError:
+            del self._entries[key]
+            self._entries[key] = entry
@@ -0,0 +1,423 @@
+"""bencode.py - command-line interface (``python -m bencodepy``)."""
+
+from bencodepy.compat import PY2, to_binary
+from bencodepy.decoder import BencodeDecoder
+from bencodepy.encoder import BencodeEncoder
+from bencodepy.events import iterparse
+from bencodepy.exceptions import BencodeDecodeError
+from bencodepy.index import INDEX_EXTENSION, BencodeIndex
+from bencodepy.metainfo import create
+from bencodepy.transcode import BINARY_TYPES, JsonTranscoder, open_buffer
+import argparse
+import base64
+import binascii
+import fnmatch
+import io
+import json
+import multiprocessing
+import os
+import pprint
+import sys
+import time
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+# Default pattern of files validated in directories
+VALIDATE_PATTERN = '*.torrent'
+
+
+class _Abbreviated(object):
+    """Long binary string (abbreviated in pretty-printed output)."""
+
+    def __init__(self, value, length):
+        self.value = value
+        self.length = length
+
+    def __repr__(self):
+        """Return the length and the (hex-encoded) start of the string."""
+        return '<%d bytes: %s...>' % (len(self.value), binascii.hexlify(self.value[:self.length]).decode('ascii'))
+
+
+def _stdin():
+    return sys.stdin if PY2 else sys.stdin.buffer
+
+
+def _stdout():
+    return sys.stdout if PY2 else sys.stdout.buffer
+
+
+def _report(path, size, seconds):
+    # type: (str, int, float) -> None
+    """Print timing and throughput (to stderr)."""
+    throughput = size / seconds / (1024 * 1024) if seconds > 0 else 0
+
+    sys.stderr.write('%s\t%d bytes\t%.3fs\t%.1f MB/s\n' % (path, size, seconds, throughput))
+
+
+def _abbreviate(value, length):
+    if isinstance(value, dict):
+        return dict((k, _abbreviate(v, length)) for k, v in value.items())
+
+    if isinstance(value, (list, tuple)):
+        return [_abbreviate(v, length) for v in value]
+
+    if isinstance(value, bytes) and len(value) > length:
+        return _Abbreviated(value, length)
+
+    return value
+
+
+def _child(x, start, key, decoder):
+    # type: (bytes, int, Union[bytes, int], BencodeDecoder) -> int
+    # Offset of child ``key`` (a dictionary key, or list index) of the container at ``start``, children after it
+    # aren't scanned
+    if isinstance(key, int) and key < 0:
+        children, _ = decoder.scan(x, start)
+        return children[key][1]
+
+    f = start + 1
+    i = 0
+
+    while x[f:f + 1] != b'e':
+        if isinstance(key, int):
+            k = i
+            i += 1
+        else:
+            k, f = decoder.decode_string(x, f, kind='key')
+
+        if k == key:
+            return f
+
+        f = decoder.skip(x, f)
+
+    if isinstance(key, int):
+        raise IndexError(key)
+
+    raise KeyError(key)
+
+
+def select(x, path, decoder=None, index=None):
+    # type: (bytes, List[str], BencodeDecoder, BencodeIndex) -> Tuple[int, int]
+    """Return the ``(start, end)`` offsets of the value at ``path`` (dictionary keys and list indices) in ``x``.
+
+    Containers along the path are scanned up to the selected child (the first child is looked up in ``index``, the
+    sidecar index of ``x``, if given), without decoding any other values. Only the selected value is validated.
+    """
+    decoder = decoder or BencodeDecoder()
+    path = list(path)
+    start = 0
+
+    if index is not None and path:
+        key = path.pop(0)
+        start, _ = index.span(int(key) if index.kind == b'l' else key)
+
+    for key in path:
+        kind = x[start:start + 1]
+
+        if kind != b'd' and kind != b'l':
+            raise KeyError(key)
+
+        try:
+            start = _child(x, start, int(key) if kind == b'l' else to_binary(key), decoder)
+        except (TypeError, ValueError):
+            raise BencodeDecodeError("not a valid bencoded string")
+
+    try:
+        return start, decoder.skip(x, start)
+    except (IndexError, KeyError, TypeError, ValueError):
+        raise BencodeDecodeError("not a valid bencoded string")
+
+
+def _open_index(path):
+    # type: (str) -> BencodeIndex
+    # Sidecar index of ``path`` (or ``None`` if it's missing, or out of date)
+    if not os.path.exists(path + INDEX_EXTENSION):
+        return None
+
+    try:
+        return BencodeIndex(path, rebuild=False)
+    except BencodeDecodeError:
+        return None
+
+
+def _files(paths, pattern):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+
+            for name in sorted(names):
+                if fnmatch.fnmatch(name, pattern):
+                    yield os.path.join(root, name)
+
+
+def _validate(path):
+    # type: (str) -> Tuple[str, int, float, str]
+    start = time.time()
+
+    try:
+        with open(path, 'rb') as fp:
+            data = fp.read()
+
+        BencodeDecoder().decode(data)
+    except (IOError, OSError, BencodeDecodeError) as ex:
+        return path, 0, time.time() - start, str(ex)
+
+    return path, len(data), time.time() - start, None
+
+
+def _from_json(value, binary, binary_keys, key=None):
+    if isinstance(value, dict):
+        return dict((k, _from_json(v, binary, binary_keys, k)) for k, v in value.items())
+
+    if isinstance(value, list):
+        return [_from_json(v, binary, binary_keys, key) for v in value]
+
+    if isinstance(value, float) or value is None:
+        raise ValueError('%r can\'t be encoded' % (value,))
+
+    if key not in binary_keys or not isinstance(value, type(u'')):
+        return value
+
+    if binary == 'base64':
+        return base64.b64decode(value)
+
+    if binary == 'hex':
+        return binascii.unhexlify(value)
+
+    return value.encode('latin-1')
+
+
+def cmd_show(args):
+    index = _open_index(args.file)
+
+    try:
+        _show(args, index)
+    finally:
+        if index is not None:
+            index.close()
+
+    return 0
+
+
+def _show(args, index):
+    with open_buffer(args.file) as x:
+        start = time.time()
+        offset, end = select(x, args.path.split('.') if args.path else [], index=index)
+
+        if args.raw:
+            _stdout().write(x[offset:end])
+        else:
+            value = BencodeDecoder(encoding='utf-8', encoding_fallback='all').decode(x[offset:end])
+            print(pprint.pformat(_abbreviate(value, args.max_bytes)))
+
+        if args.timing:
+            _report(args.file, end - offset, time.time() - start)
+
+
+def cmd_validate(args):
+    files = list(_files(args.paths, args.pattern))
+
+    start = time.time()
+    invalid = 0
+    size = 0
+
+    if args.jobs == 1 or len(files) < 2:
+        results = (_validate(path) for path in files)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.imap_unordered(_validate, files, chunksize=max(1, min(64, len(files) // 16)))
+
+    try:
+        for path, length, seconds, error in results:
+            size += length
+
+            if error is not None:
+                invalid += 1
+                print('%s: %s' % (path, error))
+            elif args.timing:
+                _report(path, length, seconds)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if args.timing:
+        _report('%d files (%d invalid)' % (len(files), invalid), size, time.time() - start)
+
+    return 1 if invalid else 0
+
+
+def cmd_to_json(args):
+    decoder = BencodeDecoder(encoding_rules=dict((key, 'bytes') for key in args.binary_key))
+
+    if args.output == '-':
+        output = sys.stdout
+    else:
+        output = io.open(args.output, 'w', encoding='utf-8')
+
+    transcoder = JsonTranscoder(decoder, args.binary, not args.no_ascii)
+
+    try:
+        start = time.time()
+
+        # Stdin is parsed in chunks (instead of being read into memory)
+        if args.source == '-':
+            transcoder.transcode_events(iterparse(_stdin(), decoder), output)
+        else:
+            transcoder.transcode(args.source, output)
+
+        output.write(u'\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if args.timing and args.source != '-':
+        _report(args.source, os.path.getsize(args.source), time.time() - start)
+
+    return 0
+
+
+def cmd_from_json(args):
+    start = time.time()
+
+    if args.source == '-':
+        value = json.load(sys.stdin)
+    else:
+        with io.open(args.source, 'r', encoding='utf-8') as fp:
+            value = json.load(fp)
+
+    value = _from_json(value, args.binary, set(args.binary_key))
+
+    if args.output == '-':
+        BencodeEncoder().encode_to(value, _stdout().write)
+    else:
+        with open(args.output, 'wb') as fp:
+            BencodeEncoder().encode_to(value, fp.write)
+
+    if args.timing and args.source != '-':
+        _report(args.source, os.path.getsize(args.source), time.time() - start)
+
+    return 0
+
+
+def cmd_index(args):
+    for path in args.files:
+        start = time.time()
+
+        with BencodeIndex.build(path) as index:
+            print('%s: %d entries (%s)' % (path, len(index), index.index_path))
+
+        if args.timing:
+            _report(path, os.path.getsize(path), time.time() - start)
+
+    return 0
+
+
+def cmd_create(args):
+    start = time.time()
+
+    metainfo = create(
+        args.path,
+        announce=args.announce[0] if args.announce else None,
+        announce_list=[[url] for url in args.announce] if len(args.announce) > 1 else None,
+        piece_length=args.piece_length,
+        name=args.name,
+        private=args.private,
+        comment=args.comment,
+        created_by=args.created_by,
+        creation_date=None if args.no_date else int(time.time()),
+        threads=args.jobs
+    )
+
+    output = args.output or os.path.basename(os.path.abspath(args.path)) + '.torrent'
+
+    if output == '-':
+        BencodeEncoder().encode_to(metainfo, _stdout().write)
+    else:
+        with open(output, 'wb') as fp:
+            BencodeEncoder().encode_to(metainfo, fp.write)
+
+    if args.timing:
+        info = metainfo[b'info']
+        length = info[b'length'] if b'length' in info else sum(f[b'length'] for f in info[b'files'])
+
+        _report(args.path, length, time.time() - start)
+
+    return 0
+
+
+def main(argv=None):
+    """Inspect, validate and transcode bencoded files."""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--timing', action='store_true', help='report per-file timing and throughput (to stderr)')
+
+    parser = argparse.ArgumentParser(prog='python -m bencodepy', description=main.__doc__)
+    subparsers = parser.add_subparsers(dest='command')
+
+    show = subparsers.add_parser('show', parents=[common], help='pretty-print a file (or the value at a path)')
+    show.add_argument('file')
+    show.add_argument('path', nargs='?', help='dictionary keys and list indices, separated by "." (e.g. info.name)')
+    show.add_argument('--max-bytes', type=int, default=32, help='abbreviate binary strings longer than this')
+    show.add_argument('--raw', action='store_true', help='write the bencoded value')
+    show.set_defaults(func=cmd_show)
+
+    validate = subparsers.add_parser('validate', parents=[common], help='validate files (and directory trees)')
+    validate.add_argument('paths', nargs='+')
+    validate.add_argument('--pattern', default=VALIDATE_PATTERN, help='pattern of files validated in directories')
+    validate.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes')
+    validate.set_defaults(func=cmd_validate)
+
+    for name, func, help_text in (
+        ('to-json', cmd_to_json, 'transcode bencode into JSON'),
+        ('from-json', cmd_from_json, 'encode JSON as bencode')
+    ):
+        transcode = subparsers.add_parser(name, parents=[common], help=help_text)
+        transcode.add_argument('source', help='input file (or "-" for stdin)')
+        transcode.add_argument('-o', '--output', default='-', help='output file (or "-" for stdout)')
+        transcode.add_argument('--binary', choices=BINARY_TYPES, default='base64',
+                               help='representation of binary strings')
+        transcode.add_argument('--binary-key', action='append', default=[],
+                               help='key of binary string values (may be repeated)')
+        transcode.set_defaults(func=func)
+
+        if name == 'to-json':
+            transcode.add_argument('--no-ascii', action='store_true', help='don\'t escape non-ASCII characters')
+
+    index = subparsers.add_parser('index', parents=[common], help='build sidecar offset indexes')
+    index.add_argument('files', nargs='+')
+    index.set_defaults(func=cmd_index)
+
+    create_parser = subparsers.add_parser('create', parents=[common], help='create a torrent file')
+    create_parser.add_argument('path', help='payload file (or directory)')
+    create_parser.add_argument('-o', '--output', help='output file (or "-" for stdout, defaults to <name>.torrent)')
+    create_parser.add_argument('-a', '--announce', action='append', default=[],
+                               help='tracker URL (may be repeated, each URL is a separate tier)')
+    create_parser.add_argument('--piece-length', type=int,
+                               help='piece length (selected from the payload size by default)')
+    create_parser.add_argument('--name', help='payload name (defaults to the base name of the path)')
+    create_parser.add_argument('--private', action='store_true', help='set the private flag')
+    create_parser.add_argument('--comment')
+    create_parser.add_argument('--created-by')
+    create_parser.add_argument('--no-date', action='store_true', help='omit the creation date')
+    create_parser.add_argument('-j', '--jobs', type=int, default=None, help='number of hashing threads')
+    create_parser.set_defaults(func=cmd_create)
+
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    try:
+        return args.func(args)
+    except (IOError, OSError, BencodeDecodeError, KeyError, IndexError, ValueError) as ex:
+        sys.stderr.write('%s: %s\n' % (parser.prog, ex))
+        return 1
@@ -1,8 +1,117 @@
 """bencode.py - common."""
 
+from bencodepy.compat import to_binary
+import bisect
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+# Maximum number of distinct key tuples shared between :class:`CompactDict` instances
+COMPACT_KEYS_CACHE_SIZE = 4096
+
 
 class Bencached(object):
     __slots__ = ['bencoded']
 
     def __init__(self, s):
         self.bencoded = s
+
+
+class CompactDict(Mapping):
+    """Compact read-only dictionary (sorted key tuple + parallel value tuple, with binary-search lookup)."""
+
+    __slots__ = ['_keys', '_values']
+
+    def __init__(self, items=()):
+        if isinstance(items, Mapping):
+            items = items.items()
+
+        items = list(dict(items).items())
+
+        try:
+            items.sort(key=lambda kv: kv[0])
+        except TypeError:
+            # Mixed key types (str and bytes are incomparable), order by binary value and use linear lookups
+            items.sort(key=lambda kv: to_binary(kv[0]))
+            self.__class__ = CompactMixedDict
+
+        self._keys = tuple(k for k, _ in items)
+        self._values = tuple(v for _, v in items)
+
+    @classmethod
+    def from_lists(cls, keys, values, keys_cache=None):
+        """Create dictionary from parallel ``keys`` and ``values`` lists (in the order they were decoded).
+
+        Dictionaries with identical keys share a single key tuple when ``keys_cache`` is provided.
+        """
+        try:
+            ordered = all(keys[i] < keys[i + 1] for i in range(len(keys) - 1))
+        except TypeError:
+            ordered = False
+
+        if not ordered:
+            return cls(zip(keys, values))
+
+        keys = tuple(keys)
+
+        if keys_cache is not None:
+            shared = keys_cache.get(keys)
+
+            if shared is not None:
+                keys = shared
+            elif len(keys_cache) < COMPACT_KEYS_CACHE_SIZE:
+                keys_cache[keys] = keys
+
+        r = cls.__new__(cls)
+        r._keys = keys
+        r._values = tuple(values)
+        return r
+
+    def __getitem__(self, key):
+        """Return the value for ``key`` (raises :class:`KeyError` if it doesn't exist)."""
+        keys = self._keys
+
+        try:
+            i = bisect.bisect_left(keys, key)
+        except TypeError:
+            raise KeyError(key)
+
+        if i < len(keys) and keys[i] == key:
+            return self._values[i]
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        """Iterate over keys (in sorted order)."""
+        return iter(self._keys)
+
+    def __len__(self):
+        """Return the number of items."""
+        return len(self._keys)
+
+    def __reduce__(self):
+        """Pickle as a list of items."""
+        return self.__class__, (list(zip(self._keys, self._values)),)
+
+    def __repr__(self):
+        """Return representation (matching ``dict``)."""
+        return '%s({%s})' % (
+            self.__class__.__name__,
+            ', '.join('%r: %r' % kv for kv in zip(self._keys, self._values))
+        )
+
+
+class CompactMixedDict(CompactDict):
+    """Compact read-only dictionary with mixed (binary and text) keys, ordered by their binary value."""
+
+    __slots__ = []
+
+    def __getitem__(self, key):
+        """Return the value for ``key`` (raises :class:`KeyError` if it doesn't exist)."""
+        for i, k in enumerate(self._keys):
+            if k == key:
+                return self._values[i]
+
+        raise KeyError(key)
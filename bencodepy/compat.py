@@ -5,6 +5,9 @@ import sys
 PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
 
+# Plain dictionaries preserve insertion order (Python 3.7+)
+DICT_INSERTION_ORDERED = sys.version_info >= (3, 7)
+
 
 def is_binary(s):
     if PY3:
@@ -0,0 +1,119 @@
+"""bencode.py - compressed input detection."""
+
+import gzip
+import io
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+# Magic bytes of compressed formats (bencoded values can't start with any of these)
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz')
+)
+
+MAGIC_SIZE = 6
+
+# File objects returning decompressed data
+DECOMPRESSED_FILE_TYPES = tuple(t for t in (
+    gzip.GzipFile,
+    bz2.BZ2File if bz2 is not None else None,
+    lzma.LZMAFile if lzma is not None else None
+) if t is not None)
+
+
+class _Prefixed(object):
+    """File-like object returning ``prefix``, followed by the rest of ``fp`` (for non-seekable streams)."""
+
+    def __init__(self, prefix, fp):
+        self.prefix = prefix
+        self.fp = fp
+
+    def read(self, size=-1):
+        prefix = self.prefix
+
+        if not prefix:
+            return self.fp.read(size)
+
+        if size is None or size < 0:
+            self.prefix = b''
+            return prefix + self.fp.read()
+
+        self.prefix = prefix[size:]
+        return prefix[:size]
+
+
+def detect(prefix):
+    # type: (bytes) -> str
+    """Return the compression format (``gzip``, ``bz2`` or ``xz``) of data starting with ``prefix``, or ``None``."""
+    if not isinstance(prefix, (bytes, bytearray)):
+        return None
+
+    for magic, kind in COMPRESSION_MAGIC:
+        if prefix.startswith(magic):
+            return kind
+
+    return None
+
+
+def sniff(fp):
+    # type: (BinaryIO) -> Tuple[BinaryIO, str]
+    """Detect the compression format of file ``fp``.
+
+    :return: ``(fp, kind)``, where ``fp`` is positioned at the start of the data (non-seekable streams are wrapped),
+             and ``kind`` is the compression format (or ``None`` for uncompressed data)
+    :rtype: tuple
+    """
+    peek = getattr(fp, 'peek', None)
+
+    if peek is not None:
+        try:
+            return fp, detect(peek(MAGIC_SIZE)[:MAGIC_SIZE])
+        except (IOError, OSError, ValueError):
+            pass
+
+    try:
+        position = fp.tell()
+    except (AttributeError, IOError, OSError, io.UnsupportedOperation):
+        position = None
+
+    prefix = fp.read(MAGIC_SIZE)
+
+    if position is not None:
+        try:
+            fp.seek(position)
+        except (AttributeError, IOError, OSError, io.UnsupportedOperation):
+            position = None
+
+    if position is None:
+        fp = _Prefixed(prefix, fp)
+
+    return fp, detect(prefix)
+
+
+def decompressed(fp, kind):
+    # type: (BinaryIO, str) -> BinaryIO
+    """Return a file object reading decompressed data from ``fp`` (compressed with format ``kind``)."""
+    if kind == 'gzip':
+        return gzip.GzipFile(fileobj=fp, mode='rb')
+
+    if kind == 'bz2' and bz2 is not None:
+        return bz2.BZ2File(fp, 'rb')
+
+    if kind == 'xz' and lzma is not None:
+        return lzma.LZMAFile(fp, 'rb')
+
+    raise ValueError('Unsupported compression format: %r' % (kind,))
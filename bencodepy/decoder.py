@@ -12,14 +12,17 @@
 
 """bencode.py - bencode decoder."""
 
-from bencodepy.compat import to_binary
+from bencodepy.common import CompactDict
+from bencodepy.compat import DICT_INSERTION_ORDERED, to_binary
 from bencodepy.exceptions import BencodeDecodeError
+from bencodepy.peers import COMPACT_RULES
 from collections import OrderedDict
+import sys
 
 try:
-    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any, Optional
 except ImportError:
-    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = Optional = None
 
 try:
     import pathlib
@@ -28,18 +31,82 @@ except ImportError:
 
 ENCODING_FALLBACK_TYPES = ('key', 'value')
 
+ENCODING_RULE_TYPES = ('bytes', 'text', 'try') + tuple(sorted(COMPACT_RULES))
+
+STRING_PREFIXES = (b'0', b'1', b'2', b'3', b'4', b'5', b'6', b'7', b'8', b'9')
+
+VALUE_PREFIXES = frozenset((b'd', b'i', b'l') + STRING_PREFIXES)
+
+# Maximum number of digits in integers (and string lengths) accepted by :meth:`BencodeDecoder.try_decode`
+BOUNDED_INT_DIGITS = 4300
+
+
+def read_int(x, f):
+    # type: (bytes, int) -> Tuple[Optional[int], int]
+    """Read the (canonical) bencoded integer in x starting at f, and return ``(value, end)``.
+
+    ``end`` is -1 for invalid (or incomplete) integers, so junk is rejected without raising exceptions.
+    """
+    end = x.find(b'e', f + 1)
+    digits = x[f + 2 if x[f + 1:f + 2] == b'-' else f + 1:end]
+
+    if end < 0 or not digits.isdigit() or len(digits) > BOUNDED_INT_DIGITS:
+        return None, -1
+
+    # Leading zeros (and negative zero)
+    if digits[0:1] == b'0' and end - f > 2:
+        return None, -1
+
+    return int(x[f + 1:end]), end + 1
+
+
+def read_string(x, f):
+    # type: (bytes, int) -> Tuple[int, int]
+    """Read the length of the bencoded string in x starting at f, and return the ``(start, end)`` of its contents.
+
+    ``end`` may be past the end of ``x`` (for incomplete input), and is -1 for invalid (or incomplete) lengths.
+    """
+    colon = x.find(b':', f, f + BOUNDED_INT_DIGITS)
+    digits = x[f:colon]
+
+    if colon < 0 or not digits.isdigit() or (digits[0:1] == b'0' and colon != f + 1):
+        return -1, -1
+
+    return colon + 1, colon + 1 + int(digits)
+
 
 class BencodeDecoder(object):
-    def __init__(self, encoding=None, encoding_fallback=None, dict_ordered=False, dict_ordered_sort=False):
+    def __init__(self, encoding=None, encoding_fallback=None, dict_ordered=False, dict_ordered_sort=False,
+                 compact=False, encoding_rules=None, max_depth=None, max_items=None, max_string_length=None,
+                 max_size=None):
         self.encoding = encoding
         self.dict_ordered = dict_ordered
         self.dict_ordered_sort = dict_ordered_sort
+        self.compact = compact
+        self.compact_keys = {}
+
+        # Resource budgets (enforced by :meth:`try_decode`)
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.max_string_length = max_string_length
+        self.max_size = max_size
 
-        if dict_ordered_sort and not dict_ordered:
+        self.bounded = any(limit is not None for limit in (max_depth, max_items, max_string_length, max_size))
+
+        # Budgets compared without checking for ``None`` (by :meth:`decode_bounded`)
+        self._item_limit = max_items if max_items is not None else sys.maxsize
+        self._string_limit = max_string_length if max_string_length is not None else sys.maxsize
+
+        if dict_ordered_sort and not dict_ordered and not DICT_INSERTION_ORDERED:
             raise ValueError(
                 'Invalid value for "dict_ordered_sort" (requires "dict_ordered" to be enabled)'
             )
 
+        if compact and dict_ordered:
+            raise ValueError(
+                'Invalid value for "compact" (can\'t be combined with "dict_ordered")'
+            )
+
         # Parse encoding fallback
         if encoding_fallback is not None and encoding_fallback not in ENCODING_FALLBACK_TYPES + ('all',):
             raise ValueError(
@@ -53,6 +120,38 @@ class BencodeDecoder(object):
         else:
             self.encoding_fallback = tuple()
 
+        # Parse encoding rules (matched against both binary and text dictionary keys)
+        self.encoding_rules = {}
+
+        for key, rule in (encoding_rules or {}).items():
+            if rule not in ENCODING_RULE_TYPES:
+                raise ValueError(
+                    'Invalid rule for %r in "encoding_rules" (expected "bytes", "text", "try", "peers", "peers6", '
+                    '"nodes" or "nodes6")' % (key,)
+                )
+
+            key = to_binary(key)
+            self.encoding_rules[key] = rule
+
+            try:
+                self.encoding_rules[key.decode(encoding or 'utf-8')] = rule
+            except UnicodeDecodeError:
+                pass
+
+        self._init_decode_func()
+
+    def __getstate__(self):
+        """Return picklable state (``decode_func`` holds bound methods, and is rebuilt on unpickle)."""
+        state = self.__dict__.copy()
+        del state['decode_func']
+        return state
+
+    def __setstate__(self, state):
+        """Restore state, and rebuild ``decode_func``."""
+        self.__dict__.update(state)
+        self._init_decode_func()
+
+    def _init_decode_func(self):
         # noinspection PyDictCreation
         self.decode_func = {}
         self.decode_func[b'l'] = self.decode_list
@@ -80,6 +179,14 @@ class BencodeDecoder(object):
         :return: Decoded value
         :rtype: object
         """
+        if self.bounded:
+            data, error = self.try_decode(value)
+
+            if error is not None:
+                raise error
+
+            return data
+
         try:
             value = to_binary(value)
             data, length = self.decode_func[value[0:1]](value, 0)
@@ -91,10 +198,253 @@ class BencodeDecoder(object):
 
         return data
 
+    def try_decode(self, value):
+        # type: (bytes) -> Tuple[Any, Optional[BencodeDecodeError]]
+        """
+        Decode bencode formatted byte string ``value`` within the decoder resource budgets.
+
+        Exceptions aren't raised for invalid values.
+
+        :param value: Bencode formatted string
+        :type value: bytes
+
+        :return: ``(data, None)``, or ``(None, error)`` for invalid values
+        :rtype: tuple
+        """
+        try:
+            value = to_binary(value)
+        except TypeError:
+            return None, BencodeDecodeError("not a valid bencoded string")
+
+        if self.max_size is not None and len(value) > self.max_size:
+            return None, BencodeDecodeError("invalid bencoded value (exceeds max_size)")
+
+        # Most junk is rejected by its first byte, and truncated values by their last byte (containers and integers
+        # end with "e")
+        if value[0:1] not in VALUE_PREFIXES:
+            return None, BencodeDecodeError("not a valid bencoded string")
+
+        if value[0:1] not in STRING_PREFIXES and value[-1:] != b'e':
+            return None, BencodeDecodeError("not a valid bencoded string")
+
+        data, error = self.decode_bounded(value)
+
+        if error is not None:
+            return None, BencodeDecodeError(error)
+
+        return data, None
+
+    def decode_bounded(self, x):
+        # type: (bytes) -> Tuple[Any, Optional[str]]
+        """Decode x (iteratively) within the decoder resource budgets.
+
+        Invalid values are rejected without raising (and catching) exceptions, helpers return an end offset of -1
+        (and the error message).
+
+        :return: ``(data, None)``, or ``(None, message)`` for invalid values
+        :rtype: tuple
+        """
+        item_limit = self._item_limit
+
+        decode_items = self._bounded_items
+        open_container = self._bounded_open
+        close_container = self._bounded_close
+
+        # Stack of open containers (see :meth:`open_container`), the top-level value is added to ``root``
+        root = [[], False, None]
+        stack = []
+        items = 0
+        f = 0
+
+        while True:
+            frame = stack[-1] if stack else root
+            f, items = decode_items(x, f, frame, items)
+
+            if f < 0:
+                return None, items
+
+            if root[0]:
+                if f != len(x) or len(root[0]) > 1:
+                    return None, "invalid bencoded value (data after valid prefix)"
+
+                return root[0][0], None
+
+            c = x[f:f + 1]
+
+            if c == b'e' and stack:
+                stack.pop()
+                v, f = close_container(frame, f)
+
+                if f < 0:
+                    return None, v
+
+                self.add_item(stack[-1] if stack else root, v)
+            elif (c == b'd' or c == b'l') and frame[1] is not None:
+                items += 1
+
+                if items > item_limit:
+                    return None, "invalid bencoded value (exceeds max_items)"
+
+                if not open_container(stack, c):
+                    return None, "invalid bencoded value (exceeds max_depth)"
+
+                f += 1
+            else:
+                return None, "not a valid bencoded string"
+
+    def _bounded_items(self, x, f, frame, items):
+        # Decode the integers and strings of container frame starting at f (until a container opens, or closes):
+        # ``(f, items)``, or ``(-1, message)``
+        item_limit = self._item_limit
+        string_limit = self._string_limit
+        plain = not self.encoding and not self.encoding_rules
+        n = len(x)
+
+        while True:
+            c = x[f:f + 1]
+            key = frame[1] is None
+
+            if c == b'i' and not key:
+                v, f = read_int(x, f)
+            elif c in STRING_PREFIXES:
+                start, end = read_string(x, f)
+
+                if end < 0 or end > n or end - start > string_limit:
+                    return -1, self._string_error(start, end)
+
+                if plain:
+                    v, f = x[start:end], end
+                else:
+                    v, f = self._bounded_text(x[start:end], frame, key, end)
+            else:
+                return f, items
+
+            items += 1
+
+            if f < 0 or items > item_limit:
+                return -1, self._item_error(items)
+
+            if key:
+                frame[1] = v
+            elif frame[1] is False:
+                frame[0].append(v)
+            else:
+                frame[0].append((frame[1], v))
+                frame[1] = None
+
+    def _bounded_text(self, s, frame, key, end):
+        # Decoded string contents s (see :meth:`decode_item_text`), and the offset after them: ``(value, end)``,
+        # or ``(None, -1)`` for undecodable text (or invalid compact strings)
+        try:
+            return self.decode_item_text(s, frame, key), end
+        except ValueError:
+            return None, -1
+
+    def _item_error(self, items):
+        if items > self._item_limit:
+            return "invalid bencoded value (exceeds max_items)"
+
+        return "not a valid bencoded string"
+
+    def _string_error(self, start, end):
+        if end >= 0 and self.max_string_length is not None and end - start > self.max_string_length:
+            return "invalid bencoded value (exceeds max_string_length)"
+
+        return "not a valid bencoded string"
+
+    def open_container(self, stack, c):
+        # type: (List[List[Any]], bytes) -> None
+        """Push the container starting with ``c`` (``d`` or ``l``) onto ``stack`` (of containers decoded item by item).
+
+        Containers are ``[items, key, rule]`` lists (``key`` is ``None`` in dictionaries before each key, ``False``
+        in lists), items are appended to ``items`` (as ``(key, value)`` pairs in dictionaries).
+
+        :raises BencodeDecodeError: if the container exceeds ``max_depth``
+        """
+        if not self._bounded_open(stack, c):
+            raise BencodeDecodeError("invalid bencoded value (exceeds max_depth)")
+
+    def close_container(self, frame):
+        # type: (List[Any]) -> Any
+        """Return the value of container ``frame`` (see :meth:`open_container`).
+
+        :raises ValueError: for dictionaries closed after a key (without a value)
+        """
+        v, end = self._bounded_close(frame, 0)
+
+        if end < 0:
+            raise ValueError(v)
+
+        return v
+
+    def _bounded_open(self, stack, c):
+        # Push the container starting with c onto stack, or return False if it exceeds max_depth
+        if self.max_depth is not None and len(stack) >= self.max_depth:
+            return False
+
+        # Rules apply to lists of strings (in dictionaries)
+        rule = None
+
+        if c == b'l' and stack and stack[-1][1] is not False:
+            rule = self.encoding_rules.get(stack[-1][1])
+
+        stack.append([[], None if c == b'd' else False, rule])
+        return True
+
+    def _bounded_close(self, frame, f):
+        # Value of container frame closed at f, and the offset after it: ``(value, end)`` (or ``(message, -1)``)
+        items, key, _ = frame
+
+        if key is False:
+            return tuple(items) if self.compact else items, f + 1
+
+        # Dictionary closed after a key (without a value)
+        if key is not None:
+            return "not a valid bencoded string", -1
+
+        try:
+            return self.build_dict(items), f + 1
+        except TypeError:
+            # Unorderable keys (text and binary keys, with encoding fallbacks)
+            return "not a valid bencoded string", -1
+
+    def add_item(self, frame, v):
+        # type: (List[Any], Any) -> None
+        """Add key (or value) ``v`` to container ``frame`` (see :meth:`open_container`)."""
+        if frame[1] is False:
+            frame[0].append(v)
+        elif frame[1] is None:
+            frame[1] = v
+        else:
+            frame[0].append((frame[1], v))
+            frame[1] = None
+
+    def decode_item_text(self, s, frame, key=False):
+        # type: (bytes, List[Any], bool) -> Any
+        """Decode string contents ``s`` as a key (or value) of container ``frame`` (or ``None`` at the top level).
+
+        Values are decoded with the rule of their key (or of the list, see :meth:`open_container`).
+        """
+        if key or frame is None:
+            rule = None
+        elif frame[1] is False:
+            rule = frame[2]
+        else:
+            rule = self.encoding_rules.get(frame[1])
+
+        if rule is None and not self.encoding:
+            return bytes(s)
+
+        return self.decode_text(s, 'key' if key else 'value', rule)
+
     def decode_int(self, x, f):
         # type: (bytes, int) -> Tuple[int, int]
         f += 1
-        newf = x.index(b'e', f)
+        newf = x.find(b'e', f)
+
+        if newf < 0:
+            raise ValueError
+
         n = int(x[f:newf])
 
         if x[f:f + 1] == b'-':
@@ -105,10 +455,14 @@ class BencodeDecoder(object):
 
         return n, newf + 1
 
-    def decode_string(self, x, f, kind='value'):
-        # type: (bytes, int) -> Tuple[bytes, int]
+    def decode_string(self, x, f, kind='value', rule=None):
+        # type: (bytes, int, str, str) -> Tuple[Union[bytes, str], int]
         """Decode torrent bencoded 'string' in x starting at f."""
-        colon = x.index(b':', f)
+        colon = x.find(b':', f)
+
+        if colon < 0:
+            raise ValueError
+
         n = int(x[f:colon])
 
         if x[f:f + 1] == b'0' and colon != f + 1:
@@ -117,41 +471,208 @@ class BencodeDecoder(object):
         colon += 1
         s = x[colon:colon + n]
 
+        if rule is None and not self.encoding:
+            return bytes(s), colon + n
+
+        return self.decode_text(s, kind, rule), colon + n
+
+    def decode_text(self, s, kind='value', rule=None):
+        # type: (bytes, str, str) -> Union[bytes, str]
+        """Decode string contents ``s`` with the decoder encoding (or encoding ``rule``)."""
+        if rule is not None:
+            return self.decode_rule_text(s, rule)
+
         if self.encoding:
             try:
-                return s.decode(self.encoding), colon + n
+                return s.decode(self.encoding)
             except UnicodeDecodeError:
                 if kind not in self.encoding_fallback:
                     raise
 
-        return bytes(s), colon + n
+        return bytes(s)
 
-    def decode_list(self, x, f):
-        # type: (bytes, int) -> Tuple[List, int]
+    def decode_rule_text(self, s, rule):
+        # type: (bytes, str) -> Any
+        """Decode string contents ``s`` with encoding ``rule``."""
+        if rule == 'bytes':
+            return bytes(s)
+
+        if rule in COMPACT_RULES:
+            return COMPACT_RULES[rule](s)
+
+        try:
+            return s.decode(self.encoding or 'utf-8')
+        except UnicodeDecodeError:
+            if rule != 'try':
+                raise
+
+        return bytes(s)
+
+    def decode_list(self, x, f, rule=None):
+        # type: (bytes, int, str) -> Tuple[List, int]
         r, f = [], f + 1
 
         while x[f:f + 1] != b'e':
-            v, f = self.decode_func[x[f:f + 1]](x, f)
+            if rule is not None and x[f:f + 1] in STRING_PREFIXES:
+                v, f = self.decode_string(x, f, rule=rule)
+            else:
+                v, f = self.decode_func[x[f:f + 1]](x, f)
+
             r.append(v)
 
+        if self.compact:
+            return tuple(r), f + 1
+
         return r, f + 1
 
     def decode_dict(self, x, f):
-        # type: (bytes, int) -> Tuple[OrderedDict[str, Any], int]
+        # type: (bytes, int) -> Tuple[Union[Dict, OrderedDict, CompactDict], int]
         """Decode bencoded dictionary."""
 
         f += 1
+        rules = self.encoding_rules
+
+        if self.compact:
+            keys, values = [], []
+
+            while x[f:f + 1] != b'e':
+                k, f = self.decode_string(x, f, kind='key')
+
+                if rules and k in rules:
+                    v, f = self.decode_rule(x, f, rules[k])
+                else:
+                    v, f = self.decode_func[x[f:f + 1]](x, f)
+
+                keys.append(k)
+                values.append(v)
+
+            return CompactDict.from_lists(keys, values, self.compact_keys), f + 1
 
         if self.dict_ordered:
             r = OrderedDict()
         else:
             r = {}
 
+        sort = self.dict_ordered_sort
+        unsorted = False
+        k = None
+
         while x[f:f + 1] != b'e':
+            previous = k
             k, f = self.decode_string(x, f, kind='key')
-            r[k], f = self.decode_func[x[f:f + 1]](x, f)
+
+            # Detect unsorted keys (canonical input is already sorted, and doesn't need to be rebuilt)
+            if sort and previous is not None and k < previous:
+                unsorted = True
+
+            if rules and k in rules:
+                r[k], f = self.decode_rule(x, f, rules[k])
+            else:
+                r[k], f = self.decode_func[x[f:f + 1]](x, f)
+
+        if unsorted:
+            r = self._sort_dict(r)
+
+        return r, f + 1
+
+    def _sort_dict(self, r):
+        if self.dict_ordered:
+            return OrderedDict(sorted(r.items()))
+
+        return dict(sorted(r.items()))
+
+    def decode_rule(self, x, f, rule):
+        # type: (bytes, int, str) -> Tuple[Any, int]
+        """Decode dictionary value in x starting at f, strings (or lists of strings) are decoded with ``rule``."""
+        c = x[f:f + 1]
+
+        if c in STRING_PREFIXES:
+            return self.decode_string(x, f, rule=rule)
+
+        if c == b'l':
+            return self.decode_list(x, f, rule=rule)
+
+        return self.decode_func[c](x, f)
+
+    def build_dict(self, items):
+        # type: (List[Tuple[Any, Any]]) -> Dict
+        """Build a dictionary from decoded ``(key, value)`` pairs (matching the output of :meth:`decode_dict`)."""
+        if self.compact:
+            return CompactDict.from_lists([k for k, _ in items], [v for _, v in items], self.compact_keys)
+
+        if self.dict_ordered:
+            r = OrderedDict(items)
+        else:
+            r = dict(items)
 
         if self.dict_ordered_sort:
-            r = OrderedDict(sorted(r.items()))
+            r = self._sort_dict(r)
+
+        return r
+
+    def skip(self, x, f):
+        # type: (bytes, int) -> int
+        """Return the offset after the bencoded value starting at ``f`` (without decoding the value).
+
+        ``x`` may be any buffer with ``find()`` and slicing (e.g. ``bytes`` or ``mmap``).
+        """
+        depth = 0
+
+        while True:
+            c = x[f:f + 1]
+
+            if c == b'd' or c == b'l':
+                depth += 1
+                f += 1
+                continue
+
+            if c == b'e' and depth:
+                depth -= 1
+                f += 1
+            elif c == b'i':
+                f = x.find(b'e', f) + 1
+
+                if not f:
+                    raise ValueError
+            elif c in STRING_PREFIXES:
+                colon = x.find(b':', f)
+
+                if colon < 0:
+                    raise ValueError
+
+                f = colon + 1 + int(x[f:colon])
+
+                if f > len(x):
+                    raise ValueError
+            else:
+                raise ValueError
+
+            if not depth:
+                return f
+
+    def scan(self, x, f=0):
+        # type: (bytes, int) -> Tuple[List[Tuple[Any, int, int]], int]
+        """Scan the container starting at ``f`` for child boundaries (without decoding the children).
+
+        :return: ``([(key, start, end), ...], end)``, where ``key`` is the decoded dictionary key (or list index)
+        :rtype: tuple
+        """
+        c = x[f:f + 1]
+
+        if c != b'd' and c != b'l':
+            raise ValueError
+
+        f += 1
+        r = []
+
+        while x[f:f + 1] != b'e':
+            if c == b'd':
+                k, f = self.decode_string(x, f, kind='key')
+            else:
+                k = len(r)
+
+            end = self.skip(x, f)
+            r.append((k, f, end))
+            f = end
 
         return r, f + 1
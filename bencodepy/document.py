@@ -0,0 +1,341 @@
+"""bencode.py - editable documents (with splice-based re-encoding)."""
+
+from bencodepy.compat import PY2, to_binary
+from bencodepy.decoder import STRING_PREFIXES, BencodeDecoder
+from bencodepy.encoder import BencodeEncoder
+from bencodepy.exceptions import BencodeDecodeError
+from collections import deque
+import copy
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+try:
+    import pathlib
+except ImportError:
+    pathlib = None
+
+
+class _Span(object):
+    """Value in the original buffer (children are scanned on demand)."""
+
+    __slots__ = ['start', 'end', 'children', 'dirty']
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+        self.children = None
+        self.dirty = False
+
+
+class _Value(object):
+    """Replaced (or added) value."""
+
+    __slots__ = ['value']
+
+    def __init__(self, value):
+        self.value = value
+
+
+class BencodeDocument(object):
+    def __init__(self, data, decoder=None, encoder=None):
+        """Editable bencode document.
+
+        Values are decoded on access, and only modified containers are re-encoded by :meth:`encode`
+        (unchanged values are copied from the original buffer).
+
+        :param data: Bencode formatted string
+        :type data: bytes
+
+        :param decoder: Decoder used for values returned by :meth:`get` (or ``None`` for a default decoder)
+        :type decoder: BencodeDecoder
+
+        :param encoder: Encoder used for modified values (or ``None`` for a default encoder)
+        :type encoder: BencodeEncoder
+        """
+        self.data = to_binary(data)
+
+        self.decoder = decoder or BencodeDecoder()
+        self.encoder = encoder or BencodeEncoder()
+
+        if PY2:
+            self._view = self.data
+        else:
+            self._view = memoryview(self.data)
+
+        try:
+            self._root = _Span(0, self.decoder.skip(self.data, 0))
+        except (IndexError, KeyError, TypeError, ValueError):
+            raise BencodeDecodeError("not a valid bencoded string")
+
+        if self._root.end != len(self.data):
+            raise BencodeDecodeError("invalid bencoded value (data after valid prefix)")
+
+    @classmethod
+    def read(cls,
+             fd,  # type: Union[bytes, str, pathlib.Path, pathlib.PurePath, TextIO, BinaryIO]
+             decoder=None,
+             encoder=None
+             ):
+        # type: (...) -> BencodeDocument
+        """Return document from filename, file, or file-like object."""
+        if isinstance(fd, (bytes, str)) or (pathlib is not None and isinstance(fd, (pathlib.Path, pathlib.PurePath))):
+            with open(str(fd), 'rb') as fp:
+                return cls(fp.read(), decoder, encoder)
+
+        return cls(fd.read(), decoder, encoder)
+
+    @property
+    def dirty(self):
+        # type: () -> bool
+        """Return ``True`` if the document has been modified."""
+        return isinstance(self._root, _Value) or self._root.dirty
+
+    def get(self, path=()):
+        # type: (Tuple) -> Any
+        """Return the decoded value at ``path`` (a tuple of dictionary keys and list indices).
+
+        Returned containers are copies, use :meth:`set` to modify the document.
+        """
+        node = self._root
+        rule = None
+
+        for i, key in enumerate(path):
+            if isinstance(node, _Value):
+                return copy.deepcopy(self._get_value(node.value, path[i:]))
+
+            children = self._expand(node)
+
+            # Rules apply to dictionary values, and strings in lists of dictionary values
+            if isinstance(children, list):
+                node = children[key]
+                rule = rule if self._is_string(node) else None
+            else:
+                key = to_binary(key)
+
+                node = children[key]
+                rule = self.decoder.encoding_rules.get(key)
+
+        return self._build(node, rule)
+
+    def set(self, path, value):
+        # type: (Tuple, Any) -> None
+        """Set the value at ``path`` (a tuple of dictionary keys and list indices).
+
+        Missing dictionary keys are added, and list items are appended when the index equals the list length.
+        ``value`` is copied (later changes to it don't modify the document).
+        """
+        value = copy.deepcopy(value)
+
+        if not path:
+            self._root = _Value(value)
+            return
+
+        parent, key = self._parent(path)
+
+        if isinstance(parent, _Value):
+            parent.value[self._value_key(parent.value, key)] = value
+            return
+
+        children = self._expand(parent)
+
+        if isinstance(children, list) and key == len(children):
+            children.append(_Value(value))
+        elif isinstance(children, list):
+            children[key] = _Value(value)
+        else:
+            children[to_binary(key)] = _Value(value)
+
+    def delete(self, path):
+        # type: (Tuple) -> None
+        """Delete the value at ``path`` (a tuple of dictionary keys and list indices)."""
+        if not path:
+            raise KeyError(path)
+
+        parent, key = self._parent(path)
+
+        if isinstance(parent, _Value):
+            del parent.value[self._value_key(parent.value, key)]
+            return
+
+        children = self._expand(parent)
+
+        if isinstance(children, list):
+            del children[key]
+        else:
+            del children[to_binary(key)]
+
+    def encode(self):
+        # type: () -> bytes
+        """Encode document (copying unmodified values from the original buffer)."""
+        return b''.join(self.fragments())
+
+    def fragments(self):
+        # type: () -> Deque
+        """Return encoded fragments of the document (unmodified values are views of the original buffer)."""
+        r = deque()
+        self._encode_node(self._root, r)
+        return r
+
+    def write(self,
+              fd  # type: Union[bytes, str, pathlib.Path, pathlib.PurePath, TextIO, BinaryIO]
+              ):
+        # type: (...) -> None
+        """Write encoded document to filename, file, or file-like object."""
+        if isinstance(fd, (bytes, str)) or (pathlib is not None and isinstance(fd, (pathlib.Path, pathlib.PurePath))):
+            with open(str(fd), 'wb') as fp:
+                return self.write(fp)
+
+        for fragment in self.fragments():
+            fd.write(fragment)
+
+    def __getitem__(self, key):
+        """Return the decoded value for top-level ``key``."""
+        return self.get((key,))
+
+    def __setitem__(self, key, value):
+        """Set the value for top-level ``key``."""
+        self.set((key,), value)
+
+    def __delitem__(self, key):
+        """Delete top-level ``key``."""
+        self.delete((key,))
+
+    def _child(self, node, key):
+        children = self._expand(node)
+
+        if isinstance(children, list):
+            return children[key]
+
+        return children[to_binary(key)]
+
+    def _parent(self, path):
+        node = self._root
+
+        # Mark containers along the path as modified (after they have been scanned)
+        for i, key in enumerate(path[:-1]):
+            if isinstance(node, _Value):
+                return _Value(self._get_value(node.value, path[i:-1])), path[-1]
+
+            self._expand(node)
+            node.dirty = True
+
+            node = self._child(node, key)
+
+        if not isinstance(node, _Value):
+            self._expand(node)
+            node.dirty = True
+
+        return node, path[-1]
+
+    def _get_value(self, value, path):
+        for key in path:
+            value = value[self._value_key(value, key)]
+
+        return value
+
+    def _value_key(self, value, key):
+        # Match text keys to binary keys in replaced dictionaries
+        if isinstance(value, dict) and key not in value and to_binary(key) in value:
+            return to_binary(key)
+
+        return key
+
+    def _expand(self, node):
+        if node.children is not None:
+            return node.children
+
+        x = self.data
+        kind = x[node.start:node.start + 1]
+
+        if kind != b'd' and kind != b'l':
+            raise TypeError('value at offset %d is not a container' % node.start)
+
+        f = node.start + 1
+
+        if kind == b'l':
+            children = []
+
+            while x[f:f + 1] != b'e':
+                end = self.decoder.skip(x, f)
+                children.append(_Span(f, end))
+                f = end
+        else:
+            children = {}
+
+            while x[f:f + 1] != b'e':
+                key, f = self.decoder.decode_string(x, f, rule='bytes')
+                end = self.decoder.skip(x, f)
+                children[key] = _Span(f, end)
+                f = end
+
+        node.children = children
+        return children
+
+    def _is_string(self, node):
+        return isinstance(node, _Span) and self.data[node.start:node.start + 1] in STRING_PREFIXES
+
+    def _build(self, node, rule=None):
+        # Decode unmodified values, and rebuild modified containers (strings, or lists of strings, use ``rule``)
+        if isinstance(node, _Value):
+            return copy.deepcopy(node.value)
+
+        if not node.dirty:
+            return self._decode_span(node, rule)
+
+        decoder = self.decoder
+
+        if isinstance(node.children, list):
+            values = [self._build(child, rule if self._is_string(child) else None) for child in node.children]
+            return tuple(values) if decoder.compact else values
+
+        items = []
+
+        for key, child in sorted(node.children.items()):
+            value = self._build(child, decoder.encoding_rules.get(key))
+
+            if decoder.encoding:
+                key = decoder.decode_text(key, 'key')
+
+            items.append((key, value))
+
+        return decoder.build_dict(items)
+
+    def _decode_span(self, node, rule):
+        if rule is None:
+            return self.decoder.decode(self.data[node.start:node.end])
+
+        try:
+            return self.decoder.decode_rule(self.data[node.start:node.end], 0, rule)[0]
+        except (IndexError, KeyError, TypeError, ValueError):
+            raise BencodeDecodeError("not a valid bencoded string")
+
+    def _encode_node(self, node, r):
+        # type: (Union[_Span, _Value], Deque) -> None
+        if isinstance(node, _Value):
+            self.encoder.encode_func[type(node.value)](node.value, r)
+            return
+
+        if not node.dirty:
+            r.append(self._view[node.start:node.end])
+            return
+
+        if isinstance(node.children, list):
+            r.append(b'l')
+
+            for child in node.children:
+                self._encode_node(child, r)
+
+            r.append(b'e')
+            return
+
+        r.append(b'd')
+
+        for key in sorted(node.children):
+            self.encoder.encode_bytes(key, r)
+            self._encode_node(node.children[key], r)
+
+        r.append(b'e')
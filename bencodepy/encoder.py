@@ -12,14 +12,16 @@
 
 """bencode.py - bencode encoder."""
 
-from bencodepy.common import Bencached
+from bencodepy.common import Bencached, CompactDict, CompactMixedDict
 from bencodepy.compat import PY2, to_binary
+from bencodepy.peers import CompactPeers
 from collections import deque
+import hashlib
 
 try:
-    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any, Callable
 except ImportError:
-    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = Callable = None
 
 try:
     from collections import OrderedDict
@@ -31,12 +33,75 @@ try:
 except ImportError:
     pathlib = None
 
+# Size of chunks passed to ``write`` by :meth:`BencodeEncoder.encode_to`
+SINK_BUFFER_SIZE = 64 * 1024
+
+# Precomputed encodings of small integers, and common dictionary keys (metainfo, tracker and KRPC messages)
+INT_ENCODED = dict((i, ('i%de' % i).encode('utf-8')) for i in range(-1, 2049))
+
+KEY_ENCODED = dict((k, ('%d:' % len(k)).encode('utf-8') + k) for k in (
+    b'a', b'announce', b'announce-list', b'comment', b'complete', b'created by', b'creation date', b'downloaded',
+    b'e', b'encoding', b'failure reason', b'files', b'id', b'implied_port', b'incomplete', b'info', b'info_hash',
+    b'interval', b'ip', b'length', b'min interval', b'name', b'nodes', b'nodes6', b'path', b'peer id', b'peers',
+    b'peers6', b'piece length', b'pieces', b'port', b'private', b'q', b'r', b't', b'target', b'token',
+    b'tracker id', b'url-list', b'v', b'values', b'warning message', b'y'
+))
+
+
+class BencodeSink(object):
+    """Encoded fragment sink, buffers fragments and passes them to ``write`` in chunks.
+
+    Fragments larger than ``buffer_size`` are passed to ``write`` directly (without a copy).
+    """
+
+    __slots__ = ['write', 'buffer_size', 'buffer', 'size']
+
+    def __init__(self, write, buffer_size=SINK_BUFFER_SIZE):
+        self.write = write
+        self.buffer_size = buffer_size
+
+        self.buffer = []
+        self.size = 0
+
+    def append(self, fragment):
+        n = len(fragment)
+
+        if n >= self.buffer_size:
+            self.flush()
+            self.write(fragment)
+            return
+
+        self.buffer.append(fragment)
+        self.size += n
+
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def extend(self, fragments):
+        for fragment in fragments:
+            self.append(fragment)
+
+    def flush(self):
+        if not self.buffer:
+            return
+
+        self.write(b''.join(self.buffer))
+
+        self.buffer = []
+        self.size = 0
+
 
 class BencodeEncoder(object):
     def __init__(self):
         # noinspection PyDictCreation
         self.encode_func = {}
         self.encode_func[Bencached] = self.encode_bencached
+        self.encode_func[CompactDict] = self.encode_compact_dict
+        self.encode_func[CompactMixedDict] = self.encode_compact_dict
+
+        # Binary buffers are encoded as strings (without a copy)
+        self.encode_func[bytearray] = self.encode_bytes
+        self.encode_func[CompactPeers] = self.encode_compact_peers
 
         if PY2:
             from types import DictType, IntType, ListType, LongType, StringType, TupleType, UnicodeType
@@ -67,6 +132,7 @@ class BencodeEncoder(object):
             self.encode_func[str] = self.encode_string
             self.encode_func[tuple] = self.encode_list
             self.encode_func[bytes] = self.encode_bytes
+            self.encode_func[memoryview] = self.encode_buffer
 
     def encode(self, value):
         # type: (Union[Tuple, List, OrderedDict, Dict, bool, int, str, bytes]) -> bytes
@@ -87,13 +153,71 @@ class BencodeEncoder(object):
         # Join parts
         return b''.join(r)
 
+    def encode_to(self, value, write, buffer_size=SINK_BUFFER_SIZE):
+        # type: (Union[Tuple, List, OrderedDict, Dict, bool, int, str, bytes], Callable, int) -> None
+        """
+        Encode ``value`` into the bencode format, passing the output to ``write`` in chunks.
+
+        The complete output isn't built.
+
+        :param value: Value
+        :type value: object
+
+        :param write: Function called with each chunk of output (e.g. ``fp.write`` or ``hash.update``)
+        :type write: callable
+
+        :param buffer_size: Size of chunks
+        :type buffer_size: int
+        """
+        r = BencodeSink(write, buffer_size)
+
+        # Encode provided value
+        self.encode_func[type(value)](value, r)
+
+        # Write remaining parts
+        r.flush()
+
+    def digest(self, value, algorithm='sha1'):
+        # type: (Union[Tuple, List, OrderedDict, Dict, bool, int, str, bytes], Union[str, Tuple[str]]) -> bytes
+        """
+        Return the digest of ``value`` in the bencode format (without building the encoded output).
+
+        :param value: Value
+        :type value: object
+
+        :param algorithm: ``hashlib`` algorithm name, or tuple of names (to compute digests in a single pass)
+        :type algorithm: str or tuple
+
+        :return: Digest (or tuple of digests)
+        :rtype: bytes or tuple
+        """
+        if not isinstance(algorithm, (list, tuple)):
+            h = hashlib.new(algorithm)
+
+            self.encode_to(value, h.update)
+            return h.digest()
+
+        hashes = [hashlib.new(name) for name in algorithm]
+
+        def write(chunk):
+            for h in hashes:
+                h.update(chunk)
+
+        self.encode_to(value, write)
+        return tuple(h.digest() for h in hashes)
+
     def encode_bencached(self, x, r):
         # type: (Bencached, Deque[bytes]) -> None
         r.append(x.bencoded)
 
     def encode_int(self, x, r):
         # type: (int, Deque[bytes]) -> None
-        r.extend((b'i', str(x).encode('utf-8'), b'e'))
+        encoded = INT_ENCODED.get(x)
+
+        if encoded is not None:
+            r.append(encoded)
+        else:
+            r.extend((b'i', str(x).encode('utf-8'), b'e'))
 
     def encode_bool(self, x, r):
         # type: (bool, Deque[bytes]) -> None
@@ -106,6 +230,17 @@ class BencodeEncoder(object):
         # type: (bytes, Deque[bytes]) -> None
         r.extend((str(len(x)).encode('utf-8'), b':', x))
 
+    def encode_buffer(self, x, r):
+        # type: (memoryview, Deque[bytes]) -> None
+        if x.ndim != 1 or x.itemsize != 1:
+            x = x.cast('B')
+
+        self.encode_bytes(x, r)
+
+    def encode_compact_peers(self, x, r):
+        # type: (CompactPeers, Deque[bytes]) -> None
+        self.encode_bytes(x.data, r)
+
     def encode_string(self, x, r):
         # type: (str, Deque[bytes]) -> None
         return self.encode_bytes(x.encode("UTF-8"), r)
@@ -128,6 +263,23 @@ class BencodeEncoder(object):
         ilist.sort(key=lambda kv: kv[0])
 
         for k, v in ilist:
+            encoded = KEY_ENCODED.get(k)
+
+            if encoded is not None:
+                r.append(encoded)
+            else:
+                self.encode_bytes(k, r)
+
+            self.encode_func[type(v)](v, r)
+
+        r.append(b'e')
+
+    def encode_compact_dict(self, x, r):
+        # type: (CompactDict, Deque[bytes]) -> None
+        r.append(b'd')
+
+        # keys are already sorted (by binary value)
+        for k, v in zip(x._keys, x._values):
             self.encode_func[type(k)](k, r)
             self.encode_func[type(v)](v, r)
 
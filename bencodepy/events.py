@@ -0,0 +1,465 @@
+"""bencode.py - event (SAX-style) parser."""
+
+from bencodepy.compat import is_binary, is_text
+from bencodepy.compression import DECOMPRESSED_FILE_TYPES, MAGIC_SIZE, decompressed, detect, sniff
+from bencodepy.decoder import STRING_PREFIXES, BencodeDecoder, read_string
+from bencodepy.exceptions import BencodeDecodeError
+from bencodepy.transcode import open_buffer
+import io
+import mmap
+import os
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any, Iterator
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = Iterator = None
+
+try:
+    import pathlib
+except ImportError:
+    pathlib = None
+
+EVENT_TYPES = ('start_dict', 'key', 'start_list', 'int', 'bytes', 'end')
+
+# Number of bytes read from streams at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_memoryview = memoryview
+
+
+class _Stream(object):
+    """Read buffer over a file-like object (consumed data is discarded on refill)."""
+
+    __slots__ = ['read', 'buffer', 'chunk_size', 'eof', 'size', 'max_size', 'files']
+
+    def __init__(self, fp, chunk_size=STREAM_CHUNK_SIZE, max_size=None, files=()):
+        self.read = fp.read
+        self.buffer = bytearray()
+        self.chunk_size = chunk_size
+        self.eof = False
+
+        self.size = 0
+        self.max_size = max_size
+
+        # Files closed with the stream
+        self.files = files
+
+    def fill(self, f, n):
+        # type: (int, int) -> int
+        """Ensure ``n`` bytes are available from offset ``f``, and return the new offset of ``f``."""
+        buf = self.buffer
+
+        if f:
+            del buf[:f]
+
+        while len(buf) < n and not self.eof:
+            chunk = self.read(max(self.chunk_size, n - len(buf)))
+
+            if not chunk:
+                self.eof = True
+                break
+
+            self.size += len(chunk)
+
+            if self.max_size is not None and self.size > self.max_size:
+                raise BencodeDecodeError("invalid bencoded value (exceeds max_size)")
+
+            buf += chunk
+
+        if len(buf) < n:
+            raise ValueError
+
+        return 0
+
+    def more(self, f):
+        # type: (int) -> int
+        """Read another chunk (discarding data before offset ``f``), and return the new offset of ``f``."""
+        buf = self.buffer
+
+        if f:
+            del buf[:f]
+
+        try:
+            self.fill(0, len(buf) + 1)
+        except ValueError:
+            pass
+
+        return 0
+
+    def at_end(self, f):
+        # type: (int) -> bool
+        """Return ``True`` if there is no data after offset ``f``."""
+        if f < len(self.buffer):
+            return False
+
+        try:
+            self.fill(f, 1)
+        except ValueError:
+            return True
+
+        return False
+
+    def close(self):
+        """Close files opened for the stream."""
+        for fp in self.files:
+            fp.close()
+
+
+def _refill(stream, f, n):
+    # Snapshot of the read buffer with ``n`` bytes available from offset ``f``, and the new offset of ``f``
+    if stream is None:
+        # In-memory buffers can't be refilled
+        raise ValueError
+
+    f = stream.fill(f, n)
+    return bytes(stream.buffer), f
+
+
+def _read_int(stream, x, f, decode_int):
+    # Integer in x starting at f (refilling ``stream`` until its end is read): ``(x, value, end)``
+    while x.find(b'e', f) < 0:
+        x, f = _refill(stream, f, len(x) - f + 1)
+
+    v, f = decode_int(x, f)
+    return x, v, f
+
+
+def _read_string(stream, x, f, max_length=None):
+    # Contents of the string in x starting at f (refilling ``stream`` until it's read): ``(x, start, end)``
+    while x.find(b':', f) < 0:
+        x, f = _refill(stream, f, len(x) - f + 1)
+
+    start, end = read_string(x, f)
+
+    if end < 0:
+        raise ValueError
+
+    if max_length is not None and end - start > max_length:
+        raise BencodeDecodeError("invalid bencoded value (exceeds max_string_length)")
+
+    # Read the rest of the string (offsets move with the start of the read buffer)
+    if end > len(x):
+        start -= f
+        end -= f
+
+        x, f = _refill(stream, f, end)
+
+        start += f
+        end += f
+
+    return x, start, end
+
+
+def _is_path(source):
+    return is_binary(source) or is_text(source) or (
+        pathlib is not None and isinstance(source, (pathlib.Path, pathlib.PurePath))
+    )
+
+
+def _is_mappable(source):
+    if isinstance(source, (bytearray, mmap.mmap)) or _is_path(source):
+        return True
+
+    # Decompressed data can't be memory-mapped
+    if isinstance(source, DECOMPRESSED_FILE_TYPES):
+        return False
+
+    try:
+        fileno = source.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return False
+
+    # Regular (non-empty) files are memory-mapped, pipes and sockets are streamed
+    try:
+        return os.fstat(fileno).st_size > 0
+    except OSError:
+        return False
+
+
+def iterparse(source, decoder=None, memoryview=False, chunk_size=STREAM_CHUNK_SIZE, max_size=None):
+    # type: (Any, BencodeDecoder, bool, int, int) -> Iterator[Tuple[str, Any]]
+    """Parse bencode from ``source``, yielding ``(event, value)`` tuples.
+
+    Events are ``start_dict``, ``key`` (binary string), ``start_list``, ``int``, ``bytes`` (binary string) and
+    ``end`` (the value of container events is ``None``). No values are built, so arbitrarily large structures are
+    processed in constant memory (plus the size of the largest string).
+
+    Compressed (``gzip``, ``bz2`` and ``xz``) sources are detected by their magic bytes, and are decompressed
+    in chunks while they are parsed.
+
+    :param source: Path, file, ``bytearray`` or ``mmap`` (regular files are memory-mapped, other file-like
+                   objects are read in chunks of ``chunk_size`` bytes)
+    :param decoder: Decoder providing parsing primitives (or ``None`` for a default decoder)
+    :param memoryview: Deliver ``bytes`` events as memoryview slices of ``source`` (``bytearray`` and ``mmap``
+                       sources only, binary strings are returned for other sources)
+    :param chunk_size: Number of bytes read from streams at a time
+    :param max_size: Maximum size of the (decompressed) input, or ``None`` for no limit
+    """
+    decode_int = (decoder or BencodeDecoder()).decode_int
+
+    # Detect compressed sources
+    if isinstance(source, (bytearray, mmap.mmap)):
+        kind = detect(source[:MAGIC_SIZE])
+
+        if kind is not None:
+            fp = decompressed(io.BytesIO(source), kind)
+            return _events(None, _Stream(fp, chunk_size, max_size, (fp,)), decode_int, False, None)
+    elif _is_path(source):
+        fp = open(str(source), 'rb')
+
+        try:
+            fp, kind = sniff(fp)
+        except Exception:
+            fp.close()
+            raise
+
+        if kind is not None:
+            stream = decompressed(fp, kind)
+            return _events(None, _Stream(stream, chunk_size, max_size, (stream, fp)), decode_int, False, None)
+
+        fp.close()
+    elif not isinstance(source, DECOMPRESSED_FILE_TYPES):
+        source, kind = sniff(source)
+
+        if kind is not None:
+            fp = decompressed(source, kind)
+            return _events(None, _Stream(fp, chunk_size, max_size, (fp,)), decode_int, False, None)
+
+    if not _is_mappable(source):
+        return _events(None, _Stream(source, chunk_size, max_size), decode_int, False, None)
+
+    views = memoryview and isinstance(source, (bytearray, mmap.mmap))
+    return _events(source, None, decode_int, views, max_size)
+
+
+def parse(source, handler, decoder=None, memoryview=False, chunk_size=STREAM_CHUNK_SIZE):
+    # type: (Any, Any, BencodeDecoder, bool, int) -> None
+    """Parse bencode from ``source``, calling the methods of ``handler`` for each event.
+
+    ``start_dict()``, ``key(k)``, ``start_list()``, ``int(v)``, ``bytes(s)`` and ``end()`` are called on
+    ``handler`` (events without a method are ignored), see :func:`iterparse` for details.
+    """
+    callbacks = {}
+
+    for event in EVENT_TYPES:
+        callbacks[event] = getattr(handler, event, None)
+
+    for event, value in iterparse(source, decoder, memoryview, chunk_size):
+        func = callbacks[event]
+
+        if func is None:
+            continue
+
+        if value is None:
+            func()
+        else:
+            func(value)
+
+
+def decode_stream(source, decoder=None, chunk_size=STREAM_CHUNK_SIZE):
+    # type: (BinaryIO, BencodeDecoder, int) -> Any
+    """Decode bencode from file-like object ``source`` incrementally (matching the output of ``decoder``).
+
+    Data is read in chunks of ``chunk_size`` bytes, values that fit into the read buffer are decoded by ``decoder``,
+    larger containers are decoded item by item (so memory use scales with the largest value, not the input size).
+    Compressed (``gzip``, ``bz2`` and ``xz``) sources are detected by their magic bytes, and are decompressed in
+    chunks.
+    """
+    decoder = decoder or BencodeDecoder()
+    source, kind = sniff(source)
+
+    if kind is not None:
+        source = decompressed(source, kind)
+        stream = _Stream(source, chunk_size, decoder.max_size, (source,))
+    else:
+        stream = _Stream(source, chunk_size, decoder.max_size)
+
+    try:
+        return _decode_stream(stream, decoder)
+    except (IndexError, KeyError, TypeError, ValueError):
+        raise BencodeDecodeError("not a valid bencoded string")
+    finally:
+        stream.close()
+
+
+def _decode_stream(stream, decoder):
+    bounded = decoder.bounded
+    max_items = decoder.max_items
+
+    # Open containers, decoded item by item (see :meth:`BencodeDecoder.open_container`)
+    stack = []
+    items = 0
+
+    # Snapshot of the read buffer (refreshed after each refill)
+    x = b''
+    f = 0
+
+    while True:
+        if f >= len(x):
+            x, f = _refill(stream, f, 1)
+
+        c = x[f:f + 1]
+        frame = stack[-1] if stack else None
+
+        if c == b'e' and frame is not None:
+            stack.pop()
+            v = decoder.close_container(frame)
+            f += 1
+        else:
+            items += 1
+
+            if max_items is not None and items > max_items:
+                raise BencodeDecodeError("invalid bencoded value (exceeds max_items)")
+
+            key = frame is not None and frame[1] is None
+
+            if (c == b'd' or c == b'l') and not key:
+                v = None
+
+                if not bounded:
+                    x, v, f = _decode_buffered(stream, decoder, x, f, frame)
+
+                # Containers that don't fit into the read buffer (or with budgets) are decoded item by item
+                if v is None:
+                    decoder.open_container(stack, c)
+                    f += 1
+                    continue
+            else:
+                x, v, f = _decode_scalar(stream, decoder, x, f, c, frame, key)
+
+        if not stack:
+            break
+
+        decoder.add_item(stack[-1], v)
+
+    if not stream.at_end(f):
+        raise BencodeDecodeError("invalid bencoded value (data after valid prefix)")
+
+    return v
+
+
+def _decode_buffered(stream, decoder, x, f, frame):
+    # Container in x starting at f, if it fits into the read buffer (reading another chunk if it doesn't):
+    # ``(x, value, end)``, or ``(x, None, f)``. Rules apply to lists of strings (in dictionaries)
+    rule = None
+
+    if frame is not None and frame[1] is not False:
+        rule = decoder.encoding_rules.get(frame[1])
+
+    for attempt in (0, 1):
+        try:
+            if rule is not None:
+                v, end = decoder.decode_rule(x, f, rule)
+            else:
+                v, end = decoder.decode_func[x[f:f + 1]](x, f)
+
+            if end <= len(x):
+                return x, v, end
+        except (IndexError, KeyError, TypeError, ValueError):
+            pass
+
+        if attempt == 0 and not stream.eof:
+            f = stream.more(f)
+            x = bytes(stream.buffer)
+
+    return x, None, f
+
+
+def _decode_scalar(stream, decoder, x, f, c, frame, key):
+    # Integer (or string) in x starting at f, a key (or value) of container ``frame``: ``(x, value, end)``
+    if c == b'i' and not key:
+        return _read_int(stream, x, f, decoder.decode_int)
+
+    if c not in STRING_PREFIXES:
+        raise ValueError
+
+    x, start, f = _read_string(stream, x, f, decoder.max_string_length)
+
+    if not decoder.encoding and not decoder.encoding_rules:
+        return x, x[start:f], f
+
+    return x, decoder.decode_item_text(x[start:f], frame, key), f
+
+
+def _events(source, stream, decode_int, views, max_size):
+    try:
+        if stream is not None:
+            # Streams are parsed from snapshots of the (refilled) read buffer
+            for event in _parse_events(stream, b'', decode_int, None):
+                yield event
+
+            return
+
+        with open_buffer(source) as x:
+            if max_size is not None and len(x) > max_size:
+                raise BencodeDecodeError("invalid bencoded value (exceeds max_size)")
+
+            for event in _parse_events(None, x, decode_int, _memoryview(x) if views else None):
+                yield event
+    finally:
+        if stream is not None:
+            stream.close()
+
+
+def _parse_events(stream, x, decode_int, view):
+    # Open containers (``True`` for dictionaries)
+    stack = []
+    expect_key = False
+    f = 0
+
+    try:
+        while True:
+            if f >= len(x):
+                x, f = _refill(stream, f, 1)
+
+            c = x[f:f + 1]
+
+            # Dictionaries can't be closed after a key (without a value)
+            if c == b'e' and stack and stack[-1] == expect_key:
+                stack.pop()
+                f += 1
+                yield 'end', None
+            elif (c == b'd' or c == b'l') and not expect_key:
+                stack.append(c == b'd')
+                expect_key = c == b'd'
+
+                f += 1
+                yield ('start_dict' if c == b'd' else 'start_list'), None
+                continue
+            else:
+                x, f, event, v = _scalar_event(stream, x, f, decode_int, view, expect_key)
+                yield event, v
+
+                if expect_key:
+                    expect_key = False
+                    continue
+
+            if not stack:
+                break
+
+            # Next dictionary item starts with a key
+            expect_key = stack[-1]
+    except (IndexError, KeyError, TypeError, ValueError):
+        raise BencodeDecodeError("not a valid bencoded string")
+
+    if f < len(x) or (stream is not None and not stream.at_end(f)):
+        raise BencodeDecodeError("invalid bencoded value (data after valid prefix)")
+
+
+def _scalar_event(stream, x, f, decode_int, view, key):
+    # Integer (or string) event starting at f: ``(x, end, event, value)``
+    c = x[f:f + 1]
+
+    if c == b'i' and not key:
+        x, v, f = _read_int(stream, x, f, decode_int)
+        return x, f, 'int', v
+
+    if c not in STRING_PREFIXES:
+        raise ValueError
+
+    x, start, f = _read_string(stream, x, f)
+
+    if key:
+        return x, f, 'key', bytes(x[start:f])
+
+    return x, f, 'bytes', view[start:f] if view is not None else bytes(x[start:f])
@@ -0,0 +1,287 @@
+"""bencode.py - sidecar offset index (random access into large files)."""
+
+from bencodepy.compat import to_binary
+from bencodepy.decoder import BencodeDecoder
+from bencodepy.encoder import BencodeEncoder
+from bencodepy.exceptions import BencodeDecodeError
+import array
+import mmap
+import os
+import sys
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+INDEX_VERSION = 1
+
+# Default sidecar index extension
+INDEX_EXTENSION = '.idx'
+
+
+def _stat(fp):
+    # Size and modification time of open file ``fp`` (matching the memory-mapped contents)
+    st = os.fstat(fp.fileno())
+    mtime_ns = getattr(st, 'st_mtime_ns', None)
+
+    if mtime_ns is None:
+        mtime_ns = int(st.st_mtime * 1000000000)
+
+    return st.st_size, mtime_ns
+
+
+def _spans_array(spans=()):
+    # Unsigned 64-bit integers (``Q`` isn't available on Python 2)
+    for code in ('Q', 'L'):
+        try:
+            r = array.array(code, spans)
+        except ValueError:
+            continue
+
+        if r.itemsize == 8:
+            return r
+
+    raise ValueError('No 64-bit array type available')
+
+
+def _spans_from_bytes(data):
+    # Spans from little-endian packed bytes (``frombytes`` isn't available on Python 2)
+    spans = _spans_array()
+
+    if hasattr(spans, 'frombytes'):
+        spans.frombytes(data)
+    else:
+        spans.fromstring(data)
+
+    if sys.byteorder != 'little':
+        spans.byteswap()
+
+    return spans
+
+
+def _spans_to_bytes(spans):
+    # Spans as little-endian packed bytes (``tobytes`` isn't available on Python 2)
+    spans = _spans_array(spans)
+
+    if sys.byteorder != 'little':
+        spans.byteswap()
+
+    if hasattr(spans, 'tobytes'):
+        return spans.tobytes()
+
+    return spans.tostring()
+
+
+class BencodeIndex(object):
+    def __init__(self, path, index_path=None, decoder=None, rebuild=True):
+        """Open ``path`` with a sidecar offset index (top-level dictionary keys, or list positions, to byte spans).
+
+        Entries are decoded from a memory-mapped view of the file, the index is built (and written to
+        ``index_path``) when it doesn't exist, or doesn't match the size and modification time of the file.
+
+        :param path: Path to a bencoded file (containing a top-level dictionary or list)
+        :type path: str
+
+        :param index_path: Path to the sidecar index (defaults to ``path`` + ``.idx``)
+        :type index_path: str
+
+        :param decoder: Decoder used for entries (or ``None`` for a default decoder)
+        :type decoder: BencodeDecoder
+
+        :param rebuild: Rebuild missing (or stale) indexes, otherwise :class:`BencodeDecodeError` is raised
+        :type rebuild: bool
+        """
+        self.path = str(path)
+        self.index_path = str(index_path) if index_path is not None else self.path + INDEX_EXTENSION
+        self.decoder = decoder or BencodeDecoder()
+
+        self.kind = None
+        self.keys = []
+        self.spans = _spans_array()
+
+        # Size and modification time of the indexed file (taken before it is scanned)
+        self._stat = None
+
+        self._fp = open(self.path, 'rb')
+
+        try:
+            # Empty files can't be memory-mapped
+            if not os.fstat(self._fp.fileno()).st_size:
+                raise BencodeDecodeError("not a valid bencoded string")
+
+            self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+            if not self._load():
+                if not rebuild:
+                    raise BencodeDecodeError('index is missing or out of date (%s)' % self.index_path)
+
+                self._build()
+                self._save()
+        except Exception:
+            self.close()
+            raise
+
+        self._positions = dict((k, i) for i, k in enumerate(self.keys))
+
+    @classmethod
+    def build(cls, path, index_path=None):
+        # type: (str, str) -> BencodeIndex
+        """Build (and write) the sidecar index for ``path``."""
+        index = cls(path, index_path, rebuild=True)
+
+        if index._loaded:
+            index._build()
+            index._save()
+
+        return index
+
+    def get(self, key, default=None):
+        # type: (Union[bytes, str, int], Any) -> Any
+        """Return the decoded entry for ``key`` (a dictionary key, or list position), or ``default``."""
+        try:
+            return self[key]
+        except (IndexError, KeyError):
+            return default
+
+    def span(self, key):
+        # type: (Union[bytes, str, int]) -> Tuple[int, int]
+        """Return the ``(offset, length)`` of the entry for ``key``."""
+        if self.kind == b'l':
+            i = key
+
+            if i < 0:
+                i += len(self)
+
+            if not 0 <= i < len(self):
+                raise IndexError(key)
+        else:
+            i = self._positions[to_binary(key)]
+
+        return self.spans[i * 2], self.spans[i * 2 + 1]
+
+    def close(self):
+        """Close the memory-mapped file."""
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def __getitem__(self, key):
+        """Return the decoded entry for ``key`` (a dictionary key, or list position)."""
+        offset, length = self.span(key)
+
+        return self.decoder.decode(self._map[offset:offset + length])
+
+    def __contains__(self, key):
+        """Return ``True`` if the index contains ``key``."""
+        try:
+            self.span(key)
+        except (IndexError, KeyError, TypeError):
+            return False
+
+        return True
+
+    def __iter__(self):
+        """Iterate over dictionary keys (or list positions)."""
+        if self.kind == b'l':
+            return iter(range(len(self)))
+
+        return iter(self.keys)
+
+    def __len__(self):
+        """Return the number of entries."""
+        return len(self.spans) // 2
+
+    def __enter__(self):
+        """Enter context (the file is closed on exit)."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Close the memory-mapped file."""
+        self.close()
+
+    def _build(self):
+        x = self._map
+
+        # Changes made while scanning leave the index stale (instead of matching the changed file)
+        self._stat = _stat(self._fp)
+
+        try:
+            children, end = BencodeDecoder().scan(x, 0)
+        except (IndexError, KeyError, TypeError, ValueError):
+            raise BencodeDecodeError("not a valid bencoded string")
+
+        if end != len(x):
+            raise BencodeDecodeError("invalid bencoded value (data after valid prefix)")
+
+        self.kind = x[0:1]
+        self.keys = [k for k, _, _ in children] if self.kind == b'd' else []
+
+        self.spans = _spans_array()
+
+        for _, start, end in children:
+            self.spans.append(start)
+            self.spans.append(end - start)
+
+    def _load(self):
+        self._loaded = False
+
+        try:
+            with open(self.index_path, 'rb') as fp:
+                data = BencodeDecoder().decode(fp.read())
+        except (IOError, OSError, BencodeDecodeError):
+            return False
+
+        size, mtime_ns = self._stat = _stat(self._fp)
+
+        if not isinstance(data, dict) or data.get(b'version') != INDEX_VERSION:
+            return False
+
+        if data.get(b'size') != size or data.get(b'mtime_ns') != mtime_ns:
+            return False
+
+        kind, keys, spans = data.get(b'kind'), data.get(b'keys'), data.get(b'spans')
+
+        # Corrupt indexes (matching the size and modification time) are rebuilt, spans are 16 bytes per entry
+        if kind not in (b'd', b'l') or not isinstance(keys, list) or not isinstance(spans, bytes):
+            return False
+
+        if len(spans) % 16 or (kind == b'd' and len(keys) * 16 != len(spans)):
+            return False
+
+        self.kind = kind
+        self.keys = keys
+        self.spans = _spans_from_bytes(spans)
+
+        self._loaded = True
+        return True
+
+    def _save(self):
+        size, mtime_ns = self._stat
+
+        data = {
+            b'version': INDEX_VERSION,
+            b'size': size,
+            b'mtime_ns': mtime_ns,
+            b'kind': self.kind,
+            b'keys': self.keys,
+            b'spans': _spans_to_bytes(self.spans)
+        }
+
+        # Replace index atomically
+        tmp_path = self.index_path + '.tmp'
+
+        with open(tmp_path, 'wb') as fp:
+            BencodeEncoder().encode_to(data, fp.write)
+
+        try:
+            os.replace(tmp_path, self.index_path)
+        except AttributeError:
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+
+            os.rename(tmp_path, self.index_path)
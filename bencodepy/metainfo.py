@@ -0,0 +1,245 @@
+"""bencode.py - metainfo (torrent) builder."""
+
+from bencodepy.compat import to_binary
+import bisect
+import hashlib
+import multiprocessing
+import multiprocessing.pool
+import os
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+# Bounds of automatically selected piece lengths (powers of two)
+PIECE_LENGTH_MIN = 16 * 1024
+PIECE_LENGTH_MAX = 16 * 1024 * 1024
+
+# Automatically selected piece lengths are doubled until there are at most this many pieces
+PIECE_COUNT_MAX = 2048
+
+# Number of batches (contiguous runs of pieces) to queue per worker thread
+HASH_BATCHES = 4
+
+# Payloads smaller than this are hashed serially (threads aren't worth it)
+HASH_PARALLEL_MIN_SIZE = 4 * 1024 * 1024
+
+DIGEST_SIZE = 20
+
+
+def piece_length_for(length):
+    # type: (int) -> int
+    """Return the automatically selected piece length for a payload of ``length`` bytes."""
+    piece_length = PIECE_LENGTH_MIN
+
+    while piece_length < PIECE_LENGTH_MAX and length > piece_length * PIECE_COUNT_MAX:
+        piece_length *= 2
+
+    return piece_length
+
+
+def collect_files(path):
+    # type: (str) -> List[Tuple[List[str], int, str]]
+    """Return the ``(components, size, path)`` of the payload files at ``path`` (a file, or a directory tree).
+
+    Files are sorted by path, ``components`` are relative to ``path`` (and empty for a single file).
+    """
+    if not os.path.isdir(path):
+        return [([], os.path.getsize(path), path)]
+
+    files = []
+
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+
+        relative = os.path.relpath(root, path)
+        components = [] if relative == os.curdir else relative.split(os.sep)
+
+        for name in sorted(names):
+            full_path = os.path.join(root, name)
+
+            if os.path.isfile(full_path):
+                files.append((components + [name], os.path.getsize(full_path), full_path))
+
+    return files
+
+
+def _hash_range(files, offsets, length, piece_length, pieces, first, last):
+    """Hash pieces ``first`` to ``last`` (exclusive) into ``pieces``, reading files sequentially."""
+    buf = memoryview(bytearray(piece_length))
+
+    current = None
+    fp = None
+    position = None
+
+    try:
+        for index in range(first, last):
+            h = hashlib.sha1()
+
+            start = index * piece_length
+            end = min(start + piece_length, length)
+
+            # Last file starting at (or before) ``start``, empty files are skipped below
+            i = bisect.bisect_right(offsets, start) - 1
+
+            while start < end:
+                _, size, path = files[i]
+                offset = start - offsets[i]
+                n = min(size - offset, end - start)
+
+                if n <= 0:
+                    i += 1
+                    continue
+
+                if i != current:
+                    if fp is not None:
+                        fp.close()
+
+                    fp = open(path, 'rb')
+                    current = i
+                    position = 0
+
+                if position != offset:
+                    fp.seek(offset)
+
+                # File reads (and hash updates of large buffers) release the GIL
+                if fp.readinto(buf[:n]) != n:
+                    raise IOError('%s: file changed while hashing' % path)
+
+                h.update(buf[:n])
+
+                position = offset + n
+                start += n
+
+            pieces[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE] = h.digest()
+    finally:
+        if fp is not None:
+            fp.close()
+
+
+def hash_pieces(files, piece_length, threads=None, min_size=HASH_PARALLEL_MIN_SIZE):
+    # type: (List[Tuple[List[str], int, str]], int, int, int) -> bytearray
+    """
+    Return the SHA-1 digests of the pieces of ``files`` (concatenated in order), hashed in parallel.
+
+    Contiguous runs of pieces are hashed across a pool of worker threads (``hashlib`` releases the GIL), each
+    reading files sequentially into a reused buffer. Digests are written into a preallocated table.
+
+    :param files: Payload files, as returned by :func:`collect_files`
+    :type files: list
+
+    :param piece_length: Piece length
+    :type piece_length: int
+
+    :param threads: Number of worker threads (or ``None`` for the CPU count)
+    :type threads: int
+
+    :param min_size: Minimum payload size to hash in parallel
+    :type min_size: int
+
+    :return: Piece digests
+    :rtype: bytearray
+    """
+    if piece_length <= 0:
+        raise ValueError('Invalid value for "piece_length" (expected a positive integer)')
+
+    if threads is None:
+        threads = multiprocessing.cpu_count()
+
+    offsets = []
+    length = 0
+
+    for _, size, _ in files:
+        offsets.append(length)
+        length += size
+
+    count = (length + piece_length - 1) // piece_length
+    pieces = bytearray(count * DIGEST_SIZE)
+
+    if length < min_size or threads < 2 or count < 2:
+        _hash_range(files, offsets, length, piece_length, pieces, 0, count)
+        return pieces
+
+    # Split pieces into contiguous batches (so each worker reads sequentially)
+    batch = (count + threads * HASH_BATCHES - 1) // (threads * HASH_BATCHES)
+    ranges = [(first, min(first + batch, count)) for first in range(0, count, batch)]
+
+    pool = multiprocessing.pool.ThreadPool(min(threads, len(ranges)))
+
+    try:
+        pool.map(lambda r: _hash_range(files, offsets, length, piece_length, pieces, r[0], r[1]), ranges, chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return pieces
+
+
+def create(path, announce=None, piece_length=None, name=None, private=False, announce_list=None, comment=None,
+           created_by=None, creation_date=None, threads=None):
+    # type: (str, str, int, str, bool, List[List[str]], str, str, int, int) -> Dict[bytes, Any]
+    """
+    Create the metainfo (torrent) dictionary for the file, or directory tree, at ``path``.
+
+    Pieces are hashed in parallel (see :func:`hash_pieces`), the ``pieces`` value is the preallocated digest
+    table (a ``bytearray``), which is written without a copy by :meth:`BencodeEncoder.encode_to` (and ``bwrite``).
+
+    :param path: Path to the payload (file or directory)
+    :type path: str
+
+    :param piece_length: Piece length (or ``None`` to select one from the payload size)
+    :type piece_length: int
+
+    :param name: Name of the payload (defaults to the base name of ``path``)
+    :type name: str
+
+    :param threads: Number of worker threads (or ``None`` for the CPU count)
+    :type threads: int
+
+    :return: Metainfo dictionary
+    :rtype: dict
+    """
+    files = collect_files(path)
+    length = sum(size for _, size, _ in files)
+
+    if piece_length is None:
+        piece_length = piece_length_for(length)
+
+    if name is None:
+        name = os.path.basename(os.path.abspath(path))
+
+    info = {
+        b'name': to_binary(name),
+        b'piece length': piece_length,
+        b'pieces': hash_pieces(files, piece_length, threads)
+    }
+
+    if os.path.isdir(path):
+        info[b'files'] = [
+            {b'length': size, b'path': [to_binary(component) for component in components]}
+            for components, size, _ in files
+        ]
+    else:
+        info[b'length'] = length
+
+    if private:
+        info[b'private'] = 1
+
+    metainfo = {b'info': info}
+
+    for key, value in (
+        (b'announce', announce),
+        (b'comment', comment),
+        (b'created by', created_by)
+    ):
+        if value is not None:
+            metainfo[key] = to_binary(value)
+
+    if announce_list is not None:
+        metainfo[b'announce-list'] = [[to_binary(url) for url in tier] for tier in announce_list]
+
+    if creation_date is not None:
+        metainfo[b'creation date'] = int(creation_date)
+
+    return metainfo
@@ -0,0 +1,261 @@
+"""bencode.py - parallel decoder."""
+
+from bencodepy.compat import to_binary
+from bencodepy.decoder import BencodeDecoder
+from bencodepy.exceptions import BencodeDecodeError
+import gc
+import marshal
+import multiprocessing
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any, Iterator
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = Iterator = None
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+# Inputs smaller than this are decoded serially (pool startup isn't worth it)
+PARALLEL_MIN_SIZE = 1024 * 1024
+
+# Number of runs (contiguous byte ranges of the top-level container) per worker process
+PARALLEL_BATCHES = 4
+
+_worker_decoder = None
+_worker_value = None
+
+
+def _worker_init(decoder, name, value):
+    global _worker_decoder, _worker_value
+
+    _worker_decoder = decoder
+
+    if name is not None:
+        # Workers decode from their own copy (shared memory buffers don't support ``find()``)
+        memory = shared_memory.SharedMemory(name=name)
+        value = bytes(memory.buf)
+        memory.close()
+
+    _worker_value = value
+
+
+def _worker_decode(run):
+    # type: (Tuple[int, int]) -> Union[bytes, Tuple[int, int, List[Any], List[Any]]]
+    start, end = run
+    result = _decode_run(_worker_decoder, _worker_value, start, end, sync=True)
+
+    # Plain values are returned marshalled (which loads about twice as fast as pickle)
+    try:
+        return marshal.dumps(result)
+    except ValueError:
+        return result
+
+
+def _decode_child(decoder, x, f, dictionary, keys, values):
+    # type: (BencodeDecoder, bytes, int, bool, List[Any], List[Any]) -> int
+    rules = decoder.encoding_rules
+
+    if dictionary:
+        k, f = decoder.decode_string(x, f, kind='key')
+        keys.append(k)
+
+        if rules and k in rules:
+            v, f = decoder.decode_rule(x, f, rules[k])
+            values.append(v)
+
+            return f
+
+    v, f = decoder.decode_func[x[f:f + 1]](x, f)
+    values.append(v)
+
+    return f
+
+
+def _decode_run(decoder, x, f, end, sync=False):
+    # type: (BencodeDecoder, bytes, int, int, bool) -> Tuple[int, int, List[Any], List[Any]]
+    """Decode the children of the top-level container of ``x`` from ``f``, up to the first child boundary after ``end``.
+
+    Runs stop early at the end of the container. With ``sync``, ``f`` may be any offset inside the container:
+    decoding restarts after invalid children (and after the end of containers enclosing ``f``), so the run starts
+    at a child boundary if ``f`` was inside a child (which is verified against the end of the previous run).
+
+    :return: ``(start, end, keys, values)`` of the run
+    :rtype: tuple
+    """
+    dictionary = x[0:1] == b'd'
+    start = f
+    keys, values = [], []
+
+    while f < end:
+        if not sync and x[f:f + 1] == b'e':
+            break
+
+        try:
+            f = _decode_child(decoder, x, f, dictionary, keys, values)
+        except (IndexError, KeyError, TypeError, ValueError):
+            if not sync:
+                raise
+
+            start = f = f + 1
+            keys, values = [], []
+
+    return start, f, keys, values
+
+
+def _runs(value, count):
+    # type: (bytes, int) -> List[Tuple[int, int]]
+    """Split the top-level container of ``value`` into ``count`` byte ranges (which aren't aligned to children)."""
+    size = len(value) - 2
+    bounds = sorted(set(1 + size * i // count for i in range(count + 1)))
+
+    return list(zip(bounds, bounds[1:]))
+
+
+def _map(runs, decoder, value, processes):
+    # type: (List[Tuple[int, int]], BencodeDecoder, bytes, int) -> Iterator[Tuple[int, int, List[Any], List[Any]]]
+    """Decode ``runs`` across a pool of worker processes, yielding the decoded runs (in order)."""
+    # Share input with workers (forked workers inherit ``value`` without a copy)
+    memory = None
+
+    if shared_memory is not None and _start_method() != 'fork':
+        memory = shared_memory.SharedMemory(create=True, size=len(value))
+        memory.buf[:len(value)] = value
+
+        initargs = (decoder, memory.name, None)
+    else:
+        initargs = (decoder, None, value)
+
+    try:
+        pool = multiprocessing.Pool(processes, initializer=_worker_init, initargs=initargs)
+
+        try:
+            for run in pool.imap(_worker_decode, runs):
+                yield run
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        if memory is not None:
+            memory.close()
+            memory.unlink()
+
+
+def _load(data):
+    # type: (bytes) -> Tuple[int, int, List[Any], List[Any]]
+    # Garbage collection is paused while loading (collections triggered by allocating the containers dominate)
+    enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        return marshal.loads(data)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _merge(value, decoder, runs, results, keys, values):
+    # type: (bytes, BencodeDecoder, List[Tuple[int, int]], Iterator[Tuple], List[Any], List[Any]) -> int
+    """Join decoded ``results`` into ``keys`` and ``values``, and return the end of the last child.
+
+    Each run is joined if it starts where the previous run ended, children before the start of misaligned runs
+    (or the whole range, if the run can't be joined) are decoded serially.
+    """
+    f = 1
+
+    for (start, end), result in zip(runs, results):
+        # Children spanning the whole range were decoded by an earlier run
+        if f >= end or value[f:f + 1] == b'e':
+            continue
+
+        if isinstance(result, bytes):
+            result = _load(result)
+
+        if result[0] != f:
+            _, f, k, v = _decode_run(decoder, value, f, result[0])
+            keys.extend(k)
+            values.extend(v)
+
+        if result[0] != f:
+            result = _decode_run(decoder, value, f, end)
+
+        keys.extend(result[2])
+        values.extend(result[3])
+        f = result[1]
+
+    return f
+
+
+def _start_method():
+    try:
+        return multiprocessing.get_start_method()
+    except AttributeError:
+        return 'fork'
+
+
+def decode_parallel(value, decoder=None, processes=None, min_size=PARALLEL_MIN_SIZE):
+    # type: (bytes, BencodeDecoder, int, int) -> Any
+    """
+    Decode bencode formatted byte string ``value`` in parallel.
+
+    The top-level container is split into byte ranges, and workers decode the children in each range (aligning
+    to the first child boundary in the range), the parent only joins runs which start where the previous run
+    ended (and decodes misaligned runs serially). Results are pickled by workers, so the speedup is bounded by
+    unpickling in the parent (which is several times cheaper than decoding).
+
+    The result is identical to :meth:`BencodeDecoder.decode`, values that aren't
+    containers (or are smaller than ``min_size``) are decoded serially, as are all values
+    for decoders with resource budgets.
+
+    :param value: Bencode formatted string
+    :type value: bytes
+
+    :param decoder: Decoder (or ``None`` for a default decoder)
+    :type decoder: BencodeDecoder
+
+    :param processes: Number of worker processes (or ``None`` for the CPU count)
+    :type processes: int
+
+    :param min_size: Minimum length of ``value`` to decode in parallel
+    :type min_size: int
+
+    :return: Decoded value
+    :rtype: object
+    """
+    if decoder is None:
+        decoder = BencodeDecoder()
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    value = to_binary(value)
+
+    # Resource budgets apply to the whole value (and are enforced by the serial decoder)
+    if decoder.bounded or len(value) < min_size or processes < 2 or value[0:1] not in (b'd', b'l'):
+        return decoder.decode(value)
+
+    keys = []
+    values = []
+    runs = _runs(value, processes * PARALLEL_BATCHES)
+
+    results = _map(runs, decoder, value, processes)
+
+    try:
+        f = _merge(value, decoder, runs, results, keys, values)
+    except (IndexError, KeyError, TypeError, ValueError):
+        raise BencodeDecodeError("not a valid bencoded string")
+    finally:
+        results.close()
+
+    if value[f:f + 1] != b'e':
+        raise BencodeDecodeError("not a valid bencoded string")
+
+    if f + 1 != len(value):
+        raise BencodeDecodeError("invalid bencoded value (data after valid prefix)")
+
+    # Reassemble children (in order)
+    if value[0:1] == b'l':
+        return values
+
+    return decoder.build_dict(list(zip(keys, values)))
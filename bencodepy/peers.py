@@ -0,0 +1,265 @@
+"""bencode.py - compact peer and node strings (columnar decoding)."""
+
+import array
+import socket
+import struct
+import sys
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+# Compact entry layouts (address size, node ID size), followed by a 2 byte port
+COMPACT_TYPES = {
+    'peers': (4, 0),
+    'peers6': (16, 0),
+    'nodes': (4, 20),
+    'nodes6': (16, 20)
+}
+
+ID_SIZE = 20
+
+
+def _array(code, size, data):
+    # Array of big-endian unsigned integers (``size`` bytes each) from ``data``
+    for c in (code, 'I', 'L'):
+        if array.array(c).itemsize == size:
+            break
+    else:
+        raise ValueError('No %d-byte array type available' % size)
+
+    r = array.array(c)
+
+    if hasattr(r, 'frombytes'):
+        r.frombytes(data)
+    else:
+        r.fromstring(bytes(data))
+
+    if sys.byteorder == 'little':
+        r.byteswap()
+
+    return r
+
+
+def _field(data, stride, offset, width):
+    # type: (bytes, int, int, int) -> bytearray
+    """Return the ``width`` byte field at ``offset`` of each ``stride`` byte entry in ``data`` (packed together)."""
+    if width == stride:
+        return bytearray(data)
+
+    r = bytearray(len(data) // stride * width)
+
+    # Extended slice assignments copy one byte of every entry each (without a loop over entries)
+    for i in range(width):
+        r[i::width] = data[offset + i::stride]
+
+    return r
+
+
+class CompactColumn(object):
+    """Sequence of fixed-width binary strings (packed into a single buffer)."""
+
+    __slots__ = ['data', 'width']
+
+    def __init__(self, data, width):
+        self.data = data
+        self.width = width
+
+    def __len__(self):
+        """Return the number of strings."""
+        return len(self.data) // self.width
+
+    def __getitem__(self, index):
+        """Return the string at ``index``."""
+        n = len(self)
+
+        if index < 0:
+            index += n
+
+        if not 0 <= index < n:
+            raise IndexError('column index out of range')
+
+        return bytes(self.data[index * self.width:(index + 1) * self.width])
+
+    def __iter__(self):
+        """Iterate over strings."""
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self):
+        """Return the number of strings, and their width."""
+        return '<CompactColumn %d x %d bytes>' % (len(self), self.width)
+
+
+class CompactPeers(object):
+    """Compact peer (or DHT node) entries, expanded into columns on first access."""
+
+    __slots__ = ['data', 'kind', '_columns']
+
+    def __init__(self, data, kind='peers'):
+        """Wrap compact string ``data`` of ``kind`` (``peers``, ``peers6``, ``nodes`` or ``nodes6``) entries.
+
+        :raises ValueError: if the length of ``data`` isn't a multiple of the entry size
+        """
+        if kind not in COMPACT_TYPES:
+            raise ValueError('Invalid value for "kind" (expected "peers", "peers6", "nodes" or "nodes6")')
+
+        address_size, id_size = COMPACT_TYPES[kind]
+
+        if len(data) % (id_size + address_size + 2):
+            raise ValueError('Invalid length for compact %s (%d bytes)' % (kind, len(data)))
+
+        self.data = bytes(data)
+        self.kind = kind
+
+        self._columns = None
+
+    @property
+    def entry_size(self):
+        address_size, id_size = COMPACT_TYPES[self.kind]
+        return id_size + address_size + 2
+
+    def columns(self):
+        # type: () -> Tuple[CompactColumn, Union[array.array, CompactColumn], array.array]
+        """Return the ID, address and port columns as a tuple, IDs are ``None`` for peers.
+
+        IPv4 addresses are an ``array`` of unsigned 32-bit integers, IPv6 addresses a :class:`CompactColumn` of
+        16 byte strings, and ports an ``array`` of unsigned 16-bit integers. Columns are built once (in a pass over
+        each byte of the entries), and cached.
+        """
+        if self._columns is not None:
+            return self._columns
+
+        data = self.data
+        address_size, id_size = COMPACT_TYPES[self.kind]
+        stride = id_size + address_size + 2
+
+        ids = CompactColumn(_field(data, stride, 0, id_size), id_size) if id_size else None
+
+        addresses = _field(data, stride, id_size, address_size)
+
+        if address_size == 4:
+            addresses = _array('I', 4, addresses)
+        else:
+            addresses = CompactColumn(addresses, address_size)
+
+        ports = _array('H', 2, _field(data, stride, id_size + address_size, 2))
+
+        self._columns = ids, addresses, ports
+        return self._columns
+
+    @property
+    def ids(self):
+        return self.columns()[0]
+
+    @property
+    def addresses(self):
+        return self.columns()[1]
+
+    @property
+    def ports(self):
+        return self.columns()[2]
+
+    def hosts(self):
+        # type: () -> List[str]
+        """Return the addresses as strings."""
+        address_size, id_size = COMPACT_TYPES[self.kind]
+        stride = id_size + address_size + 2
+
+        if address_size == 4:
+            return [socket.inet_ntoa(self.data[f:f + 4]) for f in range(id_size, len(self.data), stride)]
+
+        return [socket.inet_ntop(socket.AF_INET6, self.data[f:f + 16]) for f in range(id_size, len(self.data), stride)]
+
+    def to_numpy(self):
+        """Return the entries as a NumPy structured array (``id``, ``address`` and ``port`` fields, without a copy).
+
+        :raises ImportError: if NumPy isn't available
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('NumPy is required for CompactPeers.to_numpy()')
+
+        address_size, id_size = COMPACT_TYPES[self.kind]
+        fields = [('id', 'S%d' % id_size)] if id_size else []
+
+        fields.append(('address', '>u4' if address_size == 4 else 'V16'))
+        fields.append(('port', '>u2'))
+
+        return numpy.frombuffer(self.data, dtype=fields)
+
+    def __len__(self):
+        """Return the number of entries."""
+        return len(self.data) // self.entry_size
+
+    def __getitem__(self, index):
+        """Return the ``(host, port)`` (or ``(id, host, port)``) entry at ``index``."""
+        n = len(self)
+
+        if index < 0:
+            index += n
+
+        if not 0 <= index < n:
+            raise IndexError('compact entry index out of range')
+
+        address_size, id_size = COMPACT_TYPES[self.kind]
+        f = index * (id_size + address_size + 2)
+
+        if address_size == 4:
+            host = socket.inet_ntoa(self.data[f + id_size:f + id_size + 4])
+        else:
+            host = socket.inet_ntop(socket.AF_INET6, self.data[f + id_size:f + id_size + 16])
+
+        port, = struct.unpack('!H', self.data[f + id_size + address_size:f + id_size + address_size + 2])
+
+        if id_size:
+            return self.data[f:f + id_size], host, port
+
+        return host, port
+
+    def __iter__(self):
+        """Iterate over ``(host, port)`` (or ``(id, host, port)``) entries."""
+        hosts = self.hosts()
+        ports = self.ports
+
+        if self.kind in ('nodes', 'nodes6'):
+            return iter(zip(self.ids, hosts, ports))
+
+        return iter(zip(hosts, ports))
+
+    def __eq__(self, other):
+        """Compare with compact entries (of the same kind), or binary strings."""
+        if isinstance(other, CompactPeers):
+            return self.kind == other.kind and self.data == other.data
+
+        if isinstance(other, (bytes, bytearray)):
+            return self.data == other
+
+        return NotImplemented
+
+    def __ne__(self, other):
+        """Compare with compact entries (of the same kind), or binary strings."""
+        result = self.__eq__(other)
+
+        if result is NotImplemented:
+            return result
+
+        return not result
+
+    def __hash__(self):
+        """Return the hash of the compact string."""
+        return hash(self.data)
+
+    def __repr__(self):
+        """Return the kind, and number of entries."""
+        return '<CompactPeers %s: %d entries>' % (self.kind, len(self))
+
+
+def _factory(kind):
+    return lambda data: CompactPeers(data, kind)
+
+
+# Encoding rules expanding compact strings (see :class:`BencodeDecoder` ``encoding_rules``)
+COMPACT_RULES = dict((kind, _factory(kind)) for kind in COMPACT_TYPES)
@@ -0,0 +1,239 @@
+"""bencode.py - schema-compiled decoders."""
+
+from bencodepy.compat import to_binary
+from bencodepy.decoder import STRING_PREFIXES, BencodeDecoder, read_string
+from bencodepy.exceptions import BencodeDecodeError
+from collections import namedtuple
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+try:
+    text_type = unicode  # noqa: F821
+except NameError:
+    text_type = str
+
+_MISSING = object()
+
+
+def _decode_bytes(x, f):
+    # type: (bytes, int) -> Tuple[bytes, int]
+    """Decode bencoded binary string in x starting at f."""
+    start, end = read_string(x, f)
+
+    # Invalid lengths (``end`` is -1), and strings past the end of ``x``
+    if end < 0 or end > len(x):
+        raise ValueError
+
+    return x[start:end], end
+
+
+class ListOf(object):
+    def __init__(self, kind):
+        """Create a list type, with values of type ``kind``."""
+        self.kind = kind
+
+
+class Field(object):
+    def __init__(self, name, kind=None, required=True, default=None, key=None, choices=None):
+        """Create a schema field.
+
+        :param name: Field name (on the decoded object)
+        :type name: str
+
+        :param kind: Value type: ``int``, ``bytes``, ``str`` (text), :class:`ListOf`, :class:`Schema`
+                     or ``None`` for any value
+        :type kind: object
+
+        :param required: Reject messages without this field
+        :type required: bool
+
+        :param default: Value for missing optional fields
+        :type default: object
+
+        :param key: Dictionary key (defaults to ``name``)
+        :type key: str or bytes
+
+        :param choices: Allowed values
+        :type choices: tuple
+        """
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.default = default
+        self.key = to_binary(key if key is not None else name)
+        self.choices = frozenset(choices) if choices is not None else None
+
+
+class Schema(object):
+    def __init__(self, name, fields):
+        """Create a dictionary schema (decoded into a namedtuple called ``name``).
+
+        :param name: Type name
+        :type name: str
+
+        :param fields: Fields
+        :type fields: list of Field
+        """
+        self.name = name
+        self.fields = list(fields)
+        self.type = namedtuple(name, [field.name for field in self.fields])
+
+    def compile(self, decoder=None):
+        # type: (BencodeDecoder) -> SchemaDecoder
+        """Compile schema into a decoder.
+
+        :param decoder: Decoder used for parsing primitives (and fields without a type)
+        :type decoder: BencodeDecoder
+
+        :rtype: SchemaDecoder
+        """
+        return SchemaDecoder(self, decoder or BencodeDecoder())
+
+
+class SchemaDecoder(object):
+    def __init__(self, schema, decoder):
+        self.schema = schema
+        self.decoder = decoder
+
+        self._decode = self._compile(schema, schema.name)
+
+    def decode(self, value):
+        # type: (bytes) -> Tuple
+        """
+        Decode bencode formatted byte string ``value`` into an instance of the schema type.
+
+        :param value: Bencode formatted string
+        :type value: bytes
+
+        :return: Decoded value
+        :rtype: tuple
+        """
+        try:
+            value = to_binary(value)
+            data, length = self._decode(value, 0)
+        except (IndexError, KeyError, TypeError, ValueError):
+            raise BencodeDecodeError("not a valid bencoded string")
+
+        if length != len(value):
+            raise BencodeDecodeError("invalid bencoded value (data after valid prefix)")
+
+        return data
+
+    def _compile(self, kind, path):
+        if isinstance(kind, Schema):
+            return self._compile_schema(kind, path)
+
+        if isinstance(kind, ListOf):
+            return self._compile_list(kind, path)
+
+        if kind is None:
+            decode_func = self.decoder.decode_func
+            return lambda x, f: decode_func[x[f:f + 1]](x, f)
+
+        if kind is int:
+            return self._compile_int(path)
+
+        if kind is bytes:
+            return self._compile_string(path, 'bytes')
+
+        if kind is text_type:
+            return self._compile_string(path, 'text')
+
+        raise ValueError('Unsupported type for "%s": %r' % (path, kind))
+
+    def _compile_int(self, path):
+        decode_int = self.decoder.decode_int
+
+        def decode(x, f):
+            if x[f:f + 1] != b'i':
+                raise BencodeDecodeError('invalid value for "%s" (expected int)' % path)
+
+            return decode_int(x, f)
+
+        return decode
+
+    def _compile_string(self, path, rule):
+        if rule == 'bytes':
+            def decode(x, f):
+                if x[f:f + 1] not in STRING_PREFIXES:
+                    raise BencodeDecodeError('invalid value for "%s" (expected string)' % path)
+
+                return _decode_bytes(x, f)
+
+            return decode
+
+        decode_string = self.decoder.decode_string
+
+        def decode(x, f):
+            if x[f:f + 1] not in STRING_PREFIXES:
+                raise BencodeDecodeError('invalid value for "%s" (expected string)' % path)
+
+            return decode_string(x, f, rule=rule)
+
+        return decode
+
+    def _compile_list(self, kind, path):
+        decode_item = self._compile(kind.kind, path + '[]')
+
+        def decode(x, f):
+            if x[f:f + 1] != b'l':
+                raise BencodeDecodeError('invalid value for "%s" (expected list)' % path)
+
+            r, f = [], f + 1
+
+            while x[f:f + 1] != b'e':
+                v, f = decode_item(x, f)
+                r.append(v)
+
+            return r, f + 1
+
+        return decode
+
+    def _compile_schema(self, schema, path):
+        skip = self.decoder.skip
+        make = schema.type._make
+
+        count = len(schema.fields)
+        fields = {}
+
+        for i, field in enumerate(schema.fields):
+            fields[field.key] = (i, self._compile(field.kind, path + '.' + field.name), field.choices)
+
+        missing = [(i, field.required, field.default, field.name) for i, field in enumerate(schema.fields)]
+
+        def decode(x, f):
+            if x[f:f + 1] != b'd':
+                raise BencodeDecodeError('invalid value for "%s" (expected dict)' % path)
+
+            r, f = [_MISSING] * count, f + 1
+
+            while x[f:f + 1] != b'e':
+                k, f = _decode_bytes(x, f)
+                entry = fields.get(k)
+
+                # Skip unknown keys (without decoding the value)
+                if entry is None:
+                    f = skip(x, f)
+                    continue
+
+                i, decode_value, choices = entry
+                r[i], f = decode_value(x, f)
+
+                if choices is not None and r[i] not in choices:
+                    raise BencodeDecodeError('invalid value for "%s.%s" (%r)' % (path, schema.fields[i].name, r[i]))
+
+            for i, required, default, name in missing:
+                if r[i] is not _MISSING:
+                    continue
+
+                if required:
+                    raise BencodeDecodeError('missing field "%s.%s"' % (path, name))
+
+                r[i] = default
+
+            return make(r), f + 1
+
+        return decode
@@ -0,0 +1,314 @@
+"""bencode.py - shape-learning decoder (for streams of repetitive messages)."""
+
+from bencodepy.common import CompactDict
+from bencodepy.compat import to_binary
+from bencodepy.decoder import STRING_PREFIXES, BencodeDecoder
+from collections import OrderedDict, namedtuple
+import operator
+import re
+import threading
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+ShapeInfo = namedtuple('ShapeInfo', ['hits', 'misses', 'evictions', 'shapes'])
+
+INT_PATTERN = b'i(0|-?[1-9][0-9]*)e'
+
+# Number of messages in each hit rate sample
+SAMPLE_SIZE = 1024
+
+# Minimum hit rate, shapes are bypassed for (exponentially) increasing periods when the hit rate is lower
+SAMPLE_MIN_HIT_RATE = 0.5
+
+# Maximum number of samples bypassed
+SAMPLE_MAX_BYPASS = 64
+
+
+class _TooManyFields(Exception):
+    pass
+
+
+class _Shape(object):
+    """Learned message shape (constant bytes, and typed variable fields)."""
+
+    __slots__ = ['pattern', 'prefix', 'match', 'build']
+
+    def __init__(self, pattern, prefix, build):
+        self.pattern = pattern
+        self.prefix = prefix
+        self.match = re.compile(pattern + b'\\Z', re.DOTALL).match
+        self.build = build
+
+
+class ShapeDecoder(object):
+    def __init__(self, decoder=None, max_shapes=64, max_fields=64):
+        """Create a decoder that learns the shapes of recently decoded messages.
+
+        A shape is the exact layout of a message (keys, value types, and string lengths), messages matching a
+        learned shape are decoded by verifying the constant bytes in place and extracting only the variable
+        fields, other messages are decoded (and learned) by ``decoder``.
+
+        :param decoder: Decoder (or ``None`` for a default decoder)
+        :type decoder: BencodeDecoder
+
+        :param max_shapes: Maximum number of learned shapes (least recently used shapes are evicted)
+        :type max_shapes: int
+
+        :param max_fields: Maximum number of variable fields (integers and strings) in learned shapes
+        :type max_fields: int
+        """
+        self.decoder = decoder or BencodeDecoder()
+        self.max_shapes = max_shapes
+        self.max_fields = max_fields
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Hit rate sample (messages are decoded by ``decoder`` while ``bypass`` is positive)
+        self._sample_hits = 0
+        self._sample_size = 0
+        self._bypass = 0
+        self._bypass_samples = 0
+
+        # Shapes (in least recently used order), indexed by their constant prefix
+        self._shapes = OrderedDict()
+        self._candidates = OrderedDict()
+        self._prefixes = {}
+        self._prefix_lengths = []
+
+        self._lock = threading.Lock()
+
+    def decode(self, value):
+        # type: (bytes) -> Union[Tuple, List, OrderedDict, bool, int, str, bytes]
+        """
+        Decode bencode formatted byte string ``value`` (matching the output of ``decoder``).
+
+        :param value: Bencode formatted string
+        :type value: bytes
+
+        :return: Decoded value
+        :rtype: object
+        """
+        value = to_binary(value)
+
+        if self._bypass:
+            return self._decode_bypass(value)
+
+        for n in self._prefix_lengths:
+            for shape in self._prefixes.get(value[:n], ()):
+                m = shape.match(value)
+
+                if m is None:
+                    continue
+
+                # Integer or text conversion failed (let the decoder raise the error)
+                try:
+                    data = shape.build(m.groups())
+                except ValueError:
+                    break
+
+                with self._lock:
+                    self.hits += 1
+                    self._sample_hits += 1
+                    self._sample(shape)
+
+                return data
+
+        data = self.decoder.decode(value)
+
+        with self._lock:
+            self.misses += 1
+            self._sample(None)
+
+            if self.max_shapes > 0 and value[0:1] in (b'd', b'l'):
+                self._learn(value)
+
+        return data
+
+    def clear(self):
+        """Remove all learned shapes (counters are kept)."""
+        with self._lock:
+            self._shapes.clear()
+            self._candidates.clear()
+            self._prefixes.clear()
+            self._prefix_lengths = []
+
+    def info(self):
+        # type: () -> ShapeInfo
+        """Return shape statistics."""
+        with self._lock:
+            return ShapeInfo(self.hits, self.misses, self.evictions, len(self._shapes))
+
+    def _decode_bypass(self, value):
+        data = self.decoder.decode(value)
+
+        with self._lock:
+            self.misses += 1
+            self._bypass = max(self._bypass - 1, 0)
+
+        return data
+
+    def _sample(self, shape):
+        if shape is not None:
+            self._touch(shape)
+
+        self._sample_size += 1
+
+        if self._sample_size < SAMPLE_SIZE:
+            return
+
+        # Bypass shapes on streams without repetitive messages
+        if self._sample_hits < SAMPLE_SIZE * SAMPLE_MIN_HIT_RATE:
+            self._bypass_samples = min(max(self._bypass_samples * 2, 1), SAMPLE_MAX_BYPASS)
+            self._bypass = self._bypass_samples * SAMPLE_SIZE
+        else:
+            self._bypass_samples = 0
+
+        self._sample_hits = 0
+        self._sample_size = 0
+
+    def _touch(self, shape):
+        try:
+            self._shapes.move_to_end(shape.pattern)
+        except AttributeError:
+            del self._shapes[shape.pattern]
+            self._shapes[shape.pattern] = shape
+        except KeyError:
+            pass
+
+    def _learn(self, x):
+        parts = []
+        fields = []
+
+        try:
+            build, _, _ = self._compile(x, 0, None, parts, fields)
+        except _TooManyFields:
+            return
+
+        pattern = b''.join(parts)
+
+        if pattern in self._shapes:
+            return
+
+        # Compile shapes on their second occurrence (one-off messages aren't learned)
+        if self._candidates.pop(pattern, None) is None:
+            self._candidates[pattern] = True
+
+            if len(self._candidates) > self.max_shapes:
+                self._candidates.popitem(last=False)
+
+            return
+
+        # Constant prefix (up to the first variable field)
+        prefix = x[:fields[0]] if fields else x
+
+        shape = _Shape(pattern, prefix, build)
+
+        self._shapes[pattern] = shape
+        self._prefixes.setdefault(prefix, []).append(shape)
+
+        # Evict least recently used shapes
+        while len(self._shapes) > self.max_shapes:
+            _, evicted = self._shapes.popitem(last=False)
+
+            candidates = self._prefixes[evicted.prefix]
+            candidates.remove(evicted)
+
+            if not candidates:
+                del self._prefixes[evicted.prefix]
+
+            self.evictions += 1
+
+        self._prefix_lengths = sorted(set(len(prefix) for prefix in self._prefixes))
+
+    def _compile(self, x, f, rule, parts, fields):
+        # type: (bytes, int, str, List[bytes], List[int]) -> Tuple[Any, int, int]
+        """Compile value starting at ``f`` into pattern ``parts``, and return ``(build, index, end)``.
+
+        ``index`` is the match group of binary strings (returned as-is), or ``None`` for other values.
+        """
+        decoder = self.decoder
+        c = x[f:f + 1]
+
+        if c == b'i' or c in STRING_PREFIXES:
+            if len(fields) >= self.max_fields:
+                raise _TooManyFields()
+
+            i = len(fields)
+            fields.append(f)
+
+            if c == b'i':
+                parts.append(INT_PATTERN)
+                return (lambda g: int(g[i])), None, x.index(b'e', f) + 1
+
+            colon = x.index(b':', f)
+            n = int(x[f:colon])
+
+            parts.append(re.escape(x[f:colon + 1]) + ('(.{%d})' % n).encode('ascii'))
+
+            if rule is None and not decoder.encoding:
+                return operator.itemgetter(i), i, colon + 1 + n
+
+            decode_text = decoder.decode_text
+            return (lambda g: decode_text(g[i], 'value', rule)), None, colon + 1 + n
+
+        parts.append(c)
+        f += 1
+
+        if c == b'l':
+            children = []
+
+            while x[f:f + 1] != b'e':
+                # Rules apply to strings in lists (not nested containers)
+                child, _, f = self._compile(x, f, rule if x[f:f + 1] in STRING_PREFIXES else None, parts, fields)
+                children.append(child)
+
+            parts.append(b'e')
+            return self._compile_list(children), None, f + 1
+
+        rules = decoder.encoding_rules
+        keys, children, indices = [], [], []
+
+        while x[f:f + 1] != b'e':
+            colon = x.index(b':', f)
+            end = colon + 1 + int(x[f:colon])
+
+            parts.append(re.escape(x[f:end]))
+
+            k = decoder.decode_text(x[colon + 1:end], 'key')
+            child, i, f = self._compile(x, end, rules.get(k) if rules else None, parts, fields)
+
+            keys.append(k)
+            children.append(child)
+            indices.append(i)
+
+        parts.append(b'e')
+        return self._compile_dict(keys, children, indices), None, f + 1
+
+    def _compile_list(self, children):
+        if self.decoder.compact:
+            return lambda g: tuple([child(g) for child in children])
+
+        return lambda g: [child(g) for child in children]
+
+    def _compile_dict(self, keys, children, indices):
+        decoder = self.decoder
+
+        if decoder.compact:
+            cache = decoder.compact_keys
+            return lambda g: CompactDict.from_lists(keys, [child(g) for child in children], cache)
+
+        if decoder.dict_ordered or decoder.dict_ordered_sort:
+            build_dict = decoder.build_dict
+            return lambda g: build_dict(list(zip(keys, [child(g) for child in children])))
+
+        # Binary strings are selected directly from the match groups
+        if len(keys) > 1 and all(i is not None for i in indices):
+            getter = operator.itemgetter(*indices)
+            return lambda g: dict(zip(keys, getter(g)))
+
+        return lambda g: dict(zip(keys, [child(g) for child in children]))
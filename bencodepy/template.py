@@ -0,0 +1,108 @@
+"""bencode.py - precompiled encoding templates."""
+
+from bencodepy.compat import is_text, to_binary
+from bencodepy.encoder import INT_ENCODED, KEY_ENCODED, BencodeEncoder
+import numbers
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = None
+
+HOLE_TYPES = ('int', 'bytes', 'any')
+
+
+class Hole(object):
+    def __init__(self, name, kind='any'):
+        """Template hole, filled by :meth:`BencodeTemplate.render`.
+
+        :param name: Hole name (keyword argument of :meth:`BencodeTemplate.render`)
+        :type name: str
+
+        :param kind: Value type, ``int``, ``bytes`` (binary or text strings) or ``any``
+        :type kind: str
+        """
+        if kind not in HOLE_TYPES:
+            raise ValueError(
+                'Invalid value for "kind" (expected "int", "bytes" or "any")'
+            )
+
+        self.name = name
+        self.kind = kind
+
+
+class BencodeTemplate(object):
+    def __init__(self, shape, encoder=None):
+        """Compile fixed-shape ``shape`` into constant encoded fragments and typed holes.
+
+        :param shape: Value containing :class:`Hole` instances (e.g. ``{'interval': 1800, 'peers': Hole('peers')}``)
+        :type shape: object
+
+        :param encoder: Encoder used for constant values, and ``any`` holes (or ``None`` for a default encoder)
+        :type encoder: BencodeEncoder
+        """
+        self.encoder = encoder or BencodeEncoder()
+
+        self._parts = []
+        self._holes = []
+
+        self._compile(shape)
+
+    def render(self, **values):
+        # type: (...) -> bytes
+        """Fill holes with ``values``, and return the bencode formatted string."""
+        parts = self._parts[:]
+
+        for name, i, kind in self._holes:
+            value = values[name]
+
+            if kind == 'int':
+                # ``%d`` would truncate floats (which can't be encoded)
+                if not isinstance(value, numbers.Integral):
+                    raise TypeError('Invalid value for "%s" (expected int, found %s)' % (name, type(value).__name__))
+
+                parts[i] = INT_ENCODED.get(value) or ('i%de' % value).encode('utf-8')
+            elif kind == 'bytes':
+                if is_text(value):
+                    value = value.encode('utf-8')
+
+                parts[i] = ('%d:' % len(value)).encode('utf-8')
+                parts[i + 1] = value
+            else:
+                parts[i] = self.encoder.encode(value)
+
+        return b''.join(parts)
+
+    def _compile(self, value):
+        if isinstance(value, Hole):
+            self._holes.append((value.name, len(self._parts), value.kind))
+
+            # Reserve parts (length prefix and contents for strings)
+            if value.kind == 'bytes':
+                self._parts.extend((None, None))
+            else:
+                self._parts.append(None)
+        elif isinstance(value, dict):
+            self._constant(b'd')
+
+            for k, v in sorted(((to_binary(k), v) for k, v in value.items()), key=lambda kv: kv[0]):
+                self._constant(KEY_ENCODED.get(k) or self.encoder.encode(k))
+                self._compile(v)
+
+            self._constant(b'e')
+        elif isinstance(value, (list, tuple)):
+            self._constant(b'l')
+
+            for v in value:
+                self._compile(v)
+
+            self._constant(b'e')
+        else:
+            self._constant(self.encoder.encode(value))
+
+    def _constant(self, fragment):
+        # Merge adjacent constant fragments
+        if self._parts and self._parts[-1] is not None:
+            self._parts[-1] += fragment
+        else:
+            self._parts.append(fragment)
@@ -0,0 +1,303 @@
+"""bencode.py - bencode to JSON transcoder."""
+
+from bencodepy.compat import is_binary, is_text
+from bencodepy.decoder import STRING_PREFIXES, BencodeDecoder
+from bencodepy.exceptions import BencodeDecodeError
+from bencodepy.peers import COMPACT_RULES
+import base64
+import binascii
+import contextlib
+import io
+import json
+import mmap
+import os
+
+try:
+    from typing import Dict, List, Tuple, Deque, Union, TextIO, BinaryIO, Any, Iterator
+except ImportError:
+    Dict = List = Tuple = Deque = Union = TextIO = BinaryIO = Any = Iterator = None
+
+try:
+    import pathlib
+except ImportError:
+    pathlib = None
+
+BINARY_TYPES = ('base64', 'hex', 'latin-1')
+
+# Number of JSON fragments buffered before writing to the output stream
+OUTPUT_BUFFER_FRAGMENTS = 1024
+
+
+@contextlib.contextmanager
+def open_buffer(source):
+    """Open ``source`` as a buffer.
+
+    if source is a bytes/string or pathlib.Path-like object, it is opened and
+    memory-mapped, ``bytearray`` and ``mmap`` objects are used directly,
+    otherwise the file is memory-mapped (or .read() is used).
+    """
+    if isinstance(source, (bytearray, mmap.mmap)):
+        yield source
+        return
+
+    if is_binary(source) or is_text(source) or (
+        pathlib is not None and isinstance(source, (pathlib.Path, pathlib.PurePath))
+    ):
+        with open(str(source), 'rb') as fp:
+            with open_buffer(fp) as x:
+                yield x
+
+        return
+
+    try:
+        fileno = source.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        fileno = None
+
+    if fileno is None or os.fstat(fileno).st_size == 0:
+        yield source.read()
+        return
+
+    x = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+
+    try:
+        yield x
+    finally:
+        x.close()
+
+
+class JsonTranscoder(object):
+    def __init__(self, decoder=None, binary='base64', ensure_ascii=True):
+        """Create bencode to JSON transcoder.
+
+        :param decoder: Decoder providing parsing primitives, and ``encoding_rules`` (strings of keys with a
+                        ``bytes`` or compact peer rule are always treated as binary)
+        :type decoder: BencodeDecoder
+
+        :param binary: Representation of binary (non UTF-8) strings: ``base64``, ``hex`` or ``latin-1``
+        :type binary: str
+
+        :param ensure_ascii: Escape non-ASCII characters in the output
+        :type ensure_ascii: bool
+        """
+        if binary not in BINARY_TYPES:
+            raise ValueError(
+                'Invalid value for "binary" (expected "base64", "hex" or "latin-1")'
+            )
+
+        self.decoder = decoder or BencodeDecoder()
+        self.binary = binary
+
+        if ensure_ascii:
+            self.encode_text = json.encoder.encode_basestring_ascii
+        else:
+            self.encode_text = json.encoder.encode_basestring
+
+    def transcode(self, source, fp=None):
+        # type: (Any, TextIO) -> str
+        """Transcode bencode from ``source`` (path, file, ``bytearray`` or ``mmap``) into JSON.
+
+        The input is walked once (files are memory-mapped), and JSON is written to ``fp`` in chunks.
+
+        :param source: Path, file, ``bytearray`` or ``mmap``
+        :param fp: Output text stream (or ``None`` to return a string)
+        """
+        if fp is None:
+            fp = io.StringIO()
+            self.transcode(source, fp)
+            return fp.getvalue()
+
+        with open_buffer(source) as x:
+            try:
+                end = self._transcode(x, fp)
+            except (IndexError, KeyError, TypeError, ValueError):
+                raise BencodeDecodeError("not a valid bencoded string")
+
+            if end != len(x):
+                raise BencodeDecodeError("invalid bencoded value (data after valid prefix)")
+
+    def transcode_events(self, events, fp=None):
+        # type: (Iterator[Tuple[str, Any]], TextIO) -> str
+        """Transcode ``(event, value)`` tuples (see :func:`bencodepy.events.iterparse`) into JSON.
+
+        Unlike :meth:`transcode`, the input doesn't need to be in memory (or memory-mapped), events of streams
+        (e.g. pipes) are parsed from chunks of the input while JSON is written.
+
+        :param events: ``(event, value)`` tuples
+        :param fp: Output text stream (or ``None`` to return a string)
+        """
+        if fp is None:
+            fp = io.StringIO()
+            self.transcode_events(events, fp)
+            return fp.getvalue()
+
+        out = []
+        size = 0
+
+        # Open containers: [kind, count, rule]
+        stack = []
+
+        for event, v in events:
+            if event == 'end':
+                self._close(stack, out)
+            elif event == 'key':
+                self._key(stack[-1], v, out)
+            else:
+                frame = stack[-1] if stack else None
+
+                # Dictionary items are started by their key
+                if frame is None:
+                    rule = None
+                elif frame[0] == b'd':
+                    rule = frame[2]
+                else:
+                    rule = self._next(frame, out)
+
+                if event == 'start_dict' or event == 'start_list':
+                    self._open(stack, b'd' if event == 'start_dict' else b'l', rule, out)
+                elif event == 'int':
+                    out.append(str(v))
+                else:
+                    out.append(self.encode_string(bytes(v), rule))
+
+            # Flush output
+            size += 1
+
+            if size >= OUTPUT_BUFFER_FRAGMENTS:
+                fp.write(u''.join(out))
+
+                out = []
+                size = 0
+
+        fp.write(u''.join(out))
+
+    def encode_string(self, s, rule=None):
+        # type: (bytes, str) -> str
+        """Encode string contents ``s`` as a JSON string."""
+        if rule != 'bytes' and rule not in COMPACT_RULES:
+            try:
+                return self.encode_text(s.decode('utf-8'))
+            except UnicodeDecodeError:
+                pass
+
+        if self.binary == 'base64':
+            return '"' + base64.b64encode(s).decode('ascii') + '"'
+
+        if self.binary == 'hex':
+            return '"' + binascii.hexlify(s).decode('ascii') + '"'
+
+        return self.encode_text(s.decode('latin-1'))
+
+    def _transcode(self, x, fp):
+        out = []
+        size = 0
+
+        # Open containers: [kind, count, rule]
+        stack = []
+        f = 0
+
+        while True:
+            c = x[f:f + 1]
+            rule = None
+
+            if stack:
+                if c == b'e':
+                    self._close(stack, out)
+                    f += 1
+
+                    if not stack:
+                        break
+
+                    continue
+
+                f, rule = self._item(x, f, stack[-1], out)
+                c = x[f:f + 1]
+
+            if c == b'd' or c == b'l':
+                self._open(stack, c, rule, out)
+                f += 1
+            else:
+                f = self._scalar(x, f, c, rule, out)
+
+            if not stack:
+                break
+
+            # Flush output
+            size += 1
+
+            if size >= OUTPUT_BUFFER_FRAGMENTS:
+                fp.write(u''.join(out))
+
+                out = []
+                size = 0
+
+        fp.write(u''.join(out))
+        return f
+
+    def _open(self, stack, c, rule, out):
+        # Rules apply to lists of strings (in dictionaries)
+        if c == b'd' or not stack or stack[-1][0] != b'd':
+            rule = None
+
+        stack.append([c, 0, rule])
+        out.append('{' if c == b'd' else '[')
+
+    def _close(self, stack, out):
+        frame = stack.pop()
+        out.append('}' if frame[0] == b'd' else ']')
+
+    def _item(self, x, f, frame, out):
+        # Start the next item of container ``frame`` (writing the dictionary key), and return ``(f, rule)``
+        if frame[0] != b'd':
+            return f, self._next(frame, out)
+
+        if x[f:f + 1] not in STRING_PREFIXES:
+            raise ValueError
+
+        k, f = self.decoder.decode_string(x, f, rule='bytes')
+        return f, self._key(frame, k, out)
+
+    def _next(self, frame, out):
+        # Start the next item of container ``frame``, and return its rule
+        if frame[1]:
+            out.append(',')
+
+        frame[1] += 1
+        return frame[2]
+
+    def _key(self, frame, k, out):
+        # Start the next item of dictionary ``frame`` with key ``k``, and return the rule of its value
+        self._next(frame, out)
+        rules = self.decoder.encoding_rules
+
+        frame[2] = rules.get(k) if rules else None
+
+        out.append(self.encode_string(k))
+        out.append(':')
+
+        return frame[2]
+
+    def _scalar(self, x, f, c, rule, out):
+        if c == b'i':
+            v, f = self.decoder.decode_int(x, f)
+            out.append(str(v))
+        elif c in STRING_PREFIXES:
+            s, f = self.decoder.decode_string(x, f, rule='bytes')
+            out.append(self.encode_string(s, rule))
+        else:
+            raise ValueError
+
+        return f
+
+
+def to_json(source, fp=None, decoder=None, binary='base64', ensure_ascii=True):
+    # type: (Any, TextIO, BencodeDecoder, str, bool) -> str
+    """Transcode bencode from ``source`` (path, file, ``bytearray`` or ``mmap``) into JSON.
+
+    :param source: Path, file, ``bytearray`` or ``mmap``
+    :param fp: Output text stream (or ``None`` to return a string)
+    :param decoder: Decoder providing parsing primitives, and ``encoding_rules``
+    :param binary: Representation of binary (non UTF-8) strings: ``base64``, ``hex`` or ``latin-1``
+    :param ensure_ascii: Escape non-ASCII characters in the output
+    """
+    return JsonTranscoder(decoder, binary, ensure_ascii).transcode(source, fp)
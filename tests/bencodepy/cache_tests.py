@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - cache tests."""
+
+from bencodepy import BencodeCache, BencodeDecoder, bencode
+import gzip
+import io
+import os
+import pytest
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+EXPECTED = {b'foo': 42, b'bar': {b'sketch': b'parrot', b'foobar': 23}}
+
+
+@pytest.mark.parametrize('key', ['stat', 'digest'])
+def test_cache_read_path(key):
+    """Ensure repeated reads are cached."""
+    cache = BencodeCache(key=key)
+
+    assert cache.read(os.path.join(FIXTURE_DIR, 'alpha')) == EXPECTED
+    assert cache.read(os.path.join(FIXTURE_DIR, 'alpha')) == EXPECTED
+
+    assert cache.info() == (1, 1, 0, 1, 46)
+
+
+def test_cache_read_file():
+    """Ensure file objects are cached by digest."""
+    cache = BencodeCache()
+
+    assert cache.read(io.BytesIO(bencode(EXPECTED))) == EXPECTED
+    assert cache.read(io.BytesIO(bencode(EXPECTED))) == EXPECTED
+    assert cache.read(io.BytesIO(b'i1e')) == 1
+
+    assert cache.info()[:2] == (1, 2)
+
+
+@pytest.mark.parametrize('key', ['stat', 'digest'])
+def test_cache_read_compressed(tmpdir, key):
+    """Ensure compressed files are decompressed (and cached)."""
+    path = str(tmpdir.join('alpha.gz'))
+
+    with gzip.open(path, 'wb') as fp:
+        fp.write(bencode(EXPECTED))
+
+    cache = BencodeCache(key=key)
+
+    assert cache.read(path) == EXPECTED
+    assert cache.read(path) == EXPECTED
+
+    with open(path, 'rb') as fp:
+        assert cache.read(fp) == EXPECTED
+
+    # File objects are keyed by digest
+    assert cache.info()[:2] == ((2, 1) if key == 'digest' else (1, 2))
+
+
+def test_cache_copy():
+    """Ensure cached values can't be modified by callers."""
+    cache = BencodeCache()
+
+    value = cache.read(os.path.join(FIXTURE_DIR, 'alpha'))
+    value[b'bar'][b'sketch'] = b'spam'
+
+    assert cache.read(os.path.join(FIXTURE_DIR, 'alpha')) == EXPECTED
+
+
+def test_cache_compact():
+    """Ensure immutable values aren't copied."""
+    cache = BencodeCache(BencodeDecoder(compact=True))
+
+    assert cache.read(os.path.join(FIXTURE_DIR, 'alpha')) is cache.read(os.path.join(FIXTURE_DIR, 'alpha'))
+
+
+def test_cache_eviction():
+    """Ensure the least recently used values are evicted."""
+    cache = BencodeCache(max_entries=2)
+
+    for i in [1, 2, 1, 3, 1, 2]:
+        assert cache.read(io.BytesIO(bencode(i))) == i
+
+    assert cache.info() == (2, 4, 2, 2, 6)
+
+
+def test_cache_max_size():
+    """Ensure the total size of cached values is bounded."""
+    cache = BencodeCache(max_size=10)
+
+    cache.read(io.BytesIO(bencode(b'a' * 5)))
+    cache.read(io.BytesIO(bencode(b'b' * 5)))
+    cache.read(io.BytesIO(bencode(b'c' * 20)))
+
+    assert cache.info() == (0, 3, 1, 1, 7)
+
+
+def test_cache_modified(tmpdir):
+    """Ensure modified files are decoded again."""
+    path = str(tmpdir.join('gamma'))
+    cache = BencodeCache()
+
+    with open(path, 'wb') as fp:
+        fp.write(b'i1e')
+
+    assert cache.read(path) == 1
+
+    with open(path, 'wb') as fp:
+        fp.write(b'i10e')
+
+    assert cache.read(path) == 10
+    assert cache.info().misses == 2
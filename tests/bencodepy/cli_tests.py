@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - command-line interface tests."""
+
+from bencodepy import BencodeDecodeError, bdecode, bencode
+from bencodepy.cli import main, select
+from bencodepy.index import BencodeIndex
+import io
+import os
+import pytest
+import sys
+
+VALUE = {
+    b'announce': b'http://tracker/announce',
+    b'info': {
+        b'name': b'spam',
+        b'files': [{b'length': 1, b'path': [b'a']}, {b'length': 2, b'path': [b'b']}],
+        b'pieces': b'\x00\xff' * 30
+    }
+}
+
+
+@pytest.fixture
+def torrent(tmpdir):
+    path = tmpdir.join('spam.torrent')
+    path.write_binary(bencode(VALUE))
+    return str(path)
+
+
+def test_select():
+    """Ensure values are selected by path."""
+    x = bencode(VALUE)
+
+    start, end = select(x, ['info', 'files', '1', 'length'])
+    assert x[start:end] == b'i2e'
+
+    with pytest.raises(KeyError):
+        select(x, ['info', 'missing'])
+
+    with pytest.raises(IndexError):
+        select(x, ['info', 'files', '2'])
+
+
+def test_select_lazy():
+    """Ensure only the selected value is validated (and containers aren't scanned past the selected child)."""
+    x = bencode(VALUE)
+
+    start, end = select(x[:-10] + b'junk', ['announce'])
+    assert x[start:end] == b'23:http://tracker/announce'
+
+    with pytest.raises(BencodeDecodeError):
+        select(x[:-10], ['info'])
+
+
+def test_select_index(torrent):
+    """Ensure the first path component is looked up in the sidecar index."""
+    x = bencode(VALUE)
+
+    with BencodeIndex.build(torrent) as index:
+        assert select(x, ['info', 'files', '1'], index=index) == select(x, ['info', 'files', '1'])
+
+        with pytest.raises(KeyError):
+            select(x, ['missing'], index=index)
+
+        # Children before the first component aren't scanned
+        x = x.replace(b'23:http', b'xx:http')
+        start, end = select(x, ['info', 'name'], index=index)
+        assert x[start:end] == b'4:spam'
+
+    assert main(['show', torrent, 'info.name']) == 0
+
+
+def test_show(torrent, capsys):
+    """Ensure files (and selected values) are pretty-printed."""
+    assert main(['show', torrent]) == 0
+
+    out = capsys.readouterr().out
+    assert "'announce': 'http://tracker/announce'" in out
+    assert "<60 bytes: 00ff" in out
+
+    assert main(['show', torrent, 'info.files.0.path']) == 0
+    assert capsys.readouterr().out.strip() == "['a']"
+
+
+def test_show_raw(torrent, capfd):
+    """Ensure selected values are written as bencode."""
+    assert main(['show', torrent, 'info.name', '--raw']) == 0
+    assert capfd.readouterr().out == '4:spam'
+
+
+def test_show_missing(torrent, capsys):
+    """Ensure missing paths are reported."""
+    assert main(['show', torrent, 'info.missing']) == 1
+    assert 'missing' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_validate(tmpdir, torrent, capsys, jobs):
+    """Ensure directory trees are validated."""
+    tmpdir.mkdir('sub').join('bad.torrent').write_binary(b'd1:ai1e')
+    tmpdir.join('ignored.txt').write_binary(b'spam')
+
+    assert main(['validate', str(tmpdir), '-j', jobs, '--timing']) == 1
+
+    captured = capsys.readouterr()
+    assert captured.out.strip() == '%s: not a valid bencoded string' % os.path.join(str(tmpdir), 'sub', 'bad.torrent')
+    assert '2 files (1 invalid)' in captured.err
+    assert torrent in captured.err
+
+    assert main(['validate', torrent]) == 0
+
+
+def test_json(tmpdir, torrent):
+    """Ensure files are converted to JSON (and back)."""
+    json_path = str(tmpdir.join('spam.json'))
+    output_path = str(tmpdir.join('output.torrent'))
+
+    assert main(['to-json', torrent, '-o', json_path, '--binary', 'hex', '--binary-key', 'pieces']) == 0
+    assert main(['from-json', json_path, '-o', output_path, '--binary', 'hex', '--binary-key', 'pieces']) == 0
+
+    with open(output_path, 'rb') as fp:
+        assert bdecode(fp.read()) == VALUE
+
+
+def test_to_json_stdin(tmpdir, torrent, monkeypatch):
+    """Ensure stdin is converted to JSON (matching converted files)."""
+    paths = [str(tmpdir.join('file.json')), str(tmpdir.join('stdin.json'))]
+
+    with open(torrent, 'rb') as fp:
+        monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BufferedReader(io.BytesIO(fp.read()))))
+
+    assert main(['to-json', torrent, '-o', paths[0], '--binary-key', 'pieces']) == 0
+    assert main(['to-json', '-', '-o', paths[1], '--binary-key', 'pieces']) == 0
+
+    with open(paths[0], 'rb') as fp, open(paths[1], 'rb') as stdin_fp:
+        assert fp.read() == stdin_fp.read()
+
+
+def test_from_json_invalid(tmpdir, capsys):
+    """Ensure values that can't be encoded are rejected."""
+    json_path = tmpdir.join('float.json')
+    json_path.write_binary(b'{"a": 1.5}')
+
+    assert main(['from-json', str(json_path), '-o', str(tmpdir.join('output'))]) == 1
+    assert '1.5' in capsys.readouterr().err
+
+
+def test_index(torrent, capsys):
+    """Ensure sidecar indexes are built."""
+    assert main(['index', torrent]) == 0
+    assert '2 entries' in capsys.readouterr().out
+    assert os.path.exists(torrent + '.idx')
+
+
+def test_create(tmpdir, capsys):
+    """Ensure torrent files are created."""
+    payload = tmpdir.join('spam.bin')
+    payload.write_binary(b'spam' * 10000)
+
+    output = str(tmpdir.join('spam.torrent'))
+
+    assert main(['create', str(payload), '-o', output, '-a', 'http://a', '-a', 'http://b', '--no-date',
+                 '--piece-length', '16384', '--timing']) == 0
+    assert '40000 bytes' in capsys.readouterr().err
+
+    with open(output, 'rb') as fp:
+        metainfo = bdecode(fp.read())
+
+    assert metainfo[b'announce'] == b'http://a'
+    assert metainfo[b'announce-list'] == [[b'http://a'], [b'http://b']]
+    assert metainfo[b'info'][b'length'] == 40000
+    assert len(metainfo[b'info'][b'pieces']) == 60
+    assert b'creation date' not in metainfo
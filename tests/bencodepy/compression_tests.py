@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - compressed input tests."""
+
+from bencodepy import Bencode, BencodeDecodeError, BencodeDecoder, bencode, bread
+from bencodepy.compression import detect, sniff
+from bencodepy.events import decode_stream, iterparse
+import gzip
+import io
+import pytest
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+VALUE = {
+    b'files': [{b'length': i, b'path': [b'dir', b'file %d' % i], b'hash': b'\x00\xff' * 10} for i in range(200)],
+    b'name': u'caf\xe9'.encode('utf-8')
+}
+
+FORMATS = [('gzip', gzip.compress)]
+
+if bz2 is not None:
+    FORMATS.append(('bz2', bz2.compress))
+
+if lzma is not None:
+    FORMATS.append(('xz', lzma.compress))
+
+
+class NonSeekable(object):
+    def __init__(self, data):
+        self.fp = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self.fp.read(size)
+
+
+@pytest.mark.parametrize('kind,compress', FORMATS)
+def test_detect(kind, compress):
+    """Ensure compression formats are detected by their magic bytes."""
+    assert detect(compress(b'le')[:6]) == kind
+    assert detect(b'le') is None
+    assert detect(u'le') is None
+
+
+@pytest.mark.parametrize('kind,compress', FORMATS)
+def test_sniff(kind, compress):
+    """Ensure streams are positioned at the start of the data after detection."""
+    data = compress(bencode(VALUE))
+
+    for fp in (io.BytesIO(data), io.BufferedReader(io.BytesIO(data)), NonSeekable(data)):
+        fp, result = sniff(fp)
+
+        assert result == kind
+        assert fp.read() == data
+
+
+@pytest.mark.parametrize('kind,compress', FORMATS)
+def test_bread(tmpdir, kind, compress):
+    """Ensure compressed files are decoded."""
+    path = tmpdir.join('snapshot.' + kind)
+    path.write_binary(compress(bencode(VALUE)))
+
+    assert bread(str(path)) == VALUE
+
+    with open(str(path), 'rb') as fp:
+        assert bread(fp) == VALUE
+
+    assert bread(NonSeekable(path.read_binary())) == VALUE
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'encoding': 'utf-8', 'encoding_fallback': 'all'},
+    {'encoding': 'utf-8', 'encoding_fallback': 'all', 'encoding_rules': {'hash': 'bytes', 'path': 'text'}},
+    {'dict_ordered': True, 'dict_ordered_sort': True},
+    {'compact': True}
+])
+def test_read_options(options):
+    """Ensure decoded values match the decoder options."""
+    data = bencode(VALUE)
+
+    assert Bencode(**options).read(io.BytesIO(gzip.compress(data))) == Bencode(**options).decode(data)
+
+
+@pytest.mark.parametrize('options,error', [
+    ({'max_depth': 2}, 'max_depth'),
+    ({'max_items': 100}, 'max_items'),
+    ({'max_string_length': 10}, 'max_string_length'),
+    ({'max_size': 1000}, 'max_size')
+])
+def test_read_budgets(options, error):
+    """Ensure decoder resource budgets are enforced for compressed data."""
+    with pytest.raises(BencodeDecodeError) as exc_info:
+        Bencode(**options).read(io.BytesIO(gzip.compress(bencode(VALUE))))
+
+    assert error in str(exc_info.value)
+
+
+@pytest.mark.parametrize('value', [b'd1:ai1e', b'i1ei2e', b'd1:ai1e1:be'])
+def test_read_invalid(value):
+    """Ensure invalid compressed data is rejected."""
+    with pytest.raises(BencodeDecodeError):
+        bread(io.BytesIO(gzip.compress(value)))
+
+
+def test_iterparse_compressed(tmpdir):
+    """Ensure compressed paths and buffers are decompressed by the event parser."""
+    data = gzip.compress(bencode([1, b'spam']))
+
+    path = tmpdir.join('value.gz')
+    path.write_binary(data)
+
+    expected = [('start_list', None), ('int', 1), ('bytes', b'spam'), ('end', None)]
+
+    assert list(iterparse(str(path))) == expected
+    assert list(iterparse(bytearray(data), chunk_size=1)) == expected
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 65536])
+def test_decode_stream(chunk_size):
+    """Ensure values are decoded incrementally (for any chunk size)."""
+    decoder = BencodeDecoder(encoding='utf-8', encoding_fallback='all', encoding_rules={'path': 'bytes'})
+    data = bencode(VALUE)
+
+    assert decode_stream(io.BytesIO(data), decoder, chunk_size) == decoder.decode(data)
+    assert decode_stream(io.BytesIO(b'i42e'), chunk_size=chunk_size) == 42
+
+    with pytest.raises(BencodeDecodeError):
+        decode_stream(io.BytesIO(data[:-1]), decoder, chunk_size)
+
+    with pytest.raises(BencodeDecodeError):
+        decode_stream(io.BytesIO(data + b'i1e'), decoder, chunk_size)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 5, 8, 16, 33, 65536])
+def test_decode_stream_rules(chunk_size):
+    """Ensure rules apply to the same values, whether containers fit into the read buffer or not."""
+    value = {b'pad': b'x' * 50, b'values': [[b'a'], b'b', {b'values': [b'c']}], b'name': [[b'd']]}
+    data = bencode(value)
+
+    for decoder in [
+        BencodeDecoder(encoding_rules={'values': 'text', 'name': 'text'}),
+        BencodeDecoder(encoding_rules={'values': 'text', 'name': 'text'}, max_depth=10)
+    ]:
+        assert decode_stream(io.BytesIO(data), decoder, chunk_size) == {
+            b'pad': b'x' * 50,
+            b'values': [[b'a'], u'b', {b'values': [u'c']}],
+            b'name': [[b'd']]
+        }
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - compact container tests."""
+
+from bencodepy import Bencode, CompactDict, bencode
+import pickle
+import pytest
+
+ENCODED = b'd3:bar4:spam3:fooli1ei2eee'
+
+
+def test_decode_compact():
+    """Ensure compact containers are returned (and compare equal to plain containers)."""
+    value = Bencode(compact=True).decode(ENCODED)
+
+    assert isinstance(value, CompactDict)
+    assert isinstance(value[b'foo'], tuple)
+
+    assert value == {b'bar': b'spam', b'foo': (1, 2)}
+    assert list(value.keys()) == [b'bar', b'foo']
+
+
+def test_compact_lookup():
+    """Ensure the mapping API works as expected."""
+    value = Bencode(compact=True).decode(ENCODED)
+
+    assert len(value) == 2
+    assert b'bar' in value
+    assert b'baz' not in value
+    assert 'bar' not in value
+    assert value.get(b'baz') is None
+
+    with pytest.raises(KeyError):
+        value[b'baz']
+
+    with pytest.raises(TypeError):
+        value[b'bar'] = b'eggs'
+
+
+def test_compact_unsorted():
+    """Ensure unsorted input (and duplicate keys) are handled."""
+    value = Bencode(compact=True).decode(b'd3:foo4:spam3:bari1e3:fooi2ee')
+
+    assert list(value.items()) == [(b'bar', 1), (b'foo', 2)]
+
+
+def test_compact_mixed_keys():
+    """Ensure dictionaries with mixed key types are supported."""
+    value = CompactDict({u'foo': 1, b'bar': 2, b'\x9c': 3})
+
+    assert value[u'foo'] == 1
+    assert value[b'bar'] == 2
+    assert value[b'\x9c'] == 3
+
+    with pytest.raises(KeyError):
+        value[u'bar']
+
+    assert bencode(value) == b'd3:bari2e3:fooi1e1:\x9ci3ee'
+
+
+def test_compact_shared_keys():
+    """Ensure dictionaries with identical keys share a key tuple."""
+    bc = Bencode(compact=True)
+
+    a = bc.decode(b'd1:ai1e1:bi2ee')
+    b = bc.decode(b'd1:ai3e1:bi4ee')
+
+    assert a._keys is b._keys
+
+
+def test_compact_encode_roundtrip():
+    """Ensure compact containers can be encoded."""
+    assert bencode(Bencode(compact=True).decode(ENCODED)) == ENCODED
+
+
+def test_compact_pickle():
+    """Ensure compact containers can be pickled."""
+    value = Bencode(compact=True).decode(ENCODED)
+
+    assert pickle.loads(pickle.dumps(value)) == value
+
+
+def test_compact_ordered():
+    """Ensure compact containers can't be combined with ordered dictionaries."""
+    with pytest.raises(ValueError):
+        Bencode(dict_ordered=True, compact=True)
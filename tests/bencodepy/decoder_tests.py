@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - decoder tests."""
+
+from bencodepy import Bencode, BencodeDecodeError, bencode
+import pytest
+import sys
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    OrderedDict = None
+
+
+def test_encoding_rules():
+    """Ensure encoding rules are applied to dictionary values."""
+    bc = Bencode(encoding='utf-8', encoding_rules={
+        'pieces': 'bytes',
+        b'name': 'text',
+        'nodes': 'try'
+    })
+
+    assert bc.decode(b'd4:name4:spam5:nodes1:\x9c6:pieces4:eggse') == {
+        u'name': u'spam',
+        u'nodes': b'\x9c',
+        u'pieces': b'eggs'
+    }
+
+    with pytest.raises(BencodeDecodeError):
+        bc.decode(b'd4:name1:\x9ce')
+
+
+def test_encoding_rules_binary():
+    """Ensure "text" rules are applied without an encoding."""
+    bc = Bencode(encoding_rules={'name': 'text'})
+
+    assert bc.decode(b'd4:name4:spam5:title4:eggse') == {b'name': u'spam', b'title': b'eggs'}
+
+
+def test_encoding_rules_list():
+    """Ensure encoding rules are applied to lists of strings."""
+    bc = Bencode(encoding='utf-8', encoding_fallback='value', encoding_rules={'values': 'bytes'})
+
+    assert bc.decode(b'd6:valuesl4:spam1:\x9cee') == {u'values': [b'spam', b'\x9c']}
+    assert bc.decode(b'd5:valueli1ee6:valuesi1ee') == {u'value': [1], u'values': 1}
+
+
+def test_encoding_rules_compact():
+    """Ensure encoding rules are applied to compact dictionaries."""
+    bc = Bencode(encoding='utf-8', compact=True, encoding_rules={'pieces': 'bytes'})
+
+    assert bc.decode(b'd4:name4:spam6:pieces4:eggse') == {u'name': u'spam', u'pieces': b'eggs'}
+
+
+def test_encoding_rules_invalid():
+    """Ensure invalid encoding rules raise an exception."""
+    with pytest.raises(ValueError):
+        Bencode(encoding_rules={'pieces': 'binary'})
+
+
+def test_try_decode():
+    """Ensure values are decoded without raising exceptions."""
+    bc = Bencode(encoding='utf-8', encoding_fallback='value', dict_ordered=True, dict_ordered_sort=True)
+
+    assert bc.try_decode(b'd3:foo4:spam3:bar1:\x9ce') == ({u'bar': b'\x9c', u'foo': u'spam'}, None)
+    assert list(bc.try_decode(b'd3:foo4:spam3:bar1:\x9ce')[0].keys()) == [u'bar', u'foo']
+
+    for value in [b'', b'i01e', b'i-0e', b'4:spa', b'd3:fooe', b'di1ei2ee', b'l', b'i1ei2e', [1, 2]]:
+        data, error = bc.try_decode(value)
+
+        assert data is None
+        assert isinstance(error, BencodeDecodeError)
+
+
+def test_try_decode_junk():
+    """Ensure invalid values are rejected without raising (and catching) exceptions."""
+    bc = Bencode(max_size=1000, max_depth=4, max_string_length=50)
+    raised = []
+
+    def trace(frame, event, arg):
+        if event == 'exception':
+            raised.append(arg[0])
+
+        return trace
+
+    values = [
+        b'', b'x', b'\xff' * 100, b'ie', b'i1', b'i01e', b'i-0e', b'i1x', b'4:spa', b'04:spam', b'1x:a', b'99:spam',
+        b'd3:fooe', b'di1ei2ee', b'dli1ee1:ae', b'd1:a', b'l', b'li1e', b'lx', b'i1ei2e', b'4:spamx', b'lllllee',
+        b'l51:' + b'x' * 51 + b'e'
+    ]
+
+    previous = sys.gettrace()
+    sys.settrace(trace)
+
+    try:
+        results = [bc.try_decode(value) for value in values]
+    finally:
+        sys.settrace(previous)
+
+    assert raised == []
+
+    for data, error in results:
+        assert data is None
+        assert isinstance(error, BencodeDecodeError)
+
+
+@pytest.mark.parametrize('options,value', [
+    ({'max_depth': 2}, b'llleee'),
+    ({'max_items': 3}, b'li1ei2ei3ee'),
+    ({'max_items': 3}, b'd1:ai1e1:bi2ee'),
+    ({'max_string_length': 3}, b'4:spam'),
+    ({'max_size': 5}, b'4:spam'),
+])
+def test_budgets(options, value):
+    """Ensure resource budgets are enforced."""
+    bc = Bencode(**options)
+
+    data, error = bc.try_decode(value)
+
+    assert data is None
+    assert 'exceeds max_' in str(error)
+
+    with pytest.raises(BencodeDecodeError):
+        bc.decode(value)
+
+
+def test_budgets_valid():
+    """Ensure values within the resource budgets are decoded."""
+    bc = Bencode(max_depth=2, max_items=6, max_string_length=4, max_size=32, compact=True)
+    value = ((b'spam', 1), (2,))
+
+    assert bc.decode(bencode(value)) == value
+    assert bc.try_decode(bencode(value)) == (value, None)
+
+
+def test_budgets_nesting():
+    """Ensure deeply nested values are rejected without recursion."""
+    bc = Bencode(max_depth=100)
+
+    assert 'max_depth' in str(bc.try_decode(b'l' * 100000 + b'e' * 100000)[1])
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="Requires: Python 3.7+")
+def test_dict_sorted_plain():
+    """Ensure plain dictionaries are sorted (when required)."""
+    bc = Bencode(dict_ordered_sort=True)
+
+    value = bc.decode(b'd3:fooi1e3:bari2e3:bazd1:bi1e1:ai2eee')
+
+    assert type(value) is dict
+    assert list(value.keys()) == [b'bar', b'baz', b'foo']
+    assert list(value[b'baz'].keys()) == [b'a', b'b']
+
+    assert list(bc.decode(b'd1:ai1e1:bi2e1:ai3ee').items()) == [(b'a', 3), (b'b', 2)]
+
+
+def test_dict_sorted_ordered():
+    """Ensure ordered dictionaries are sorted (when required)."""
+    bc = Bencode(dict_ordered=True, dict_ordered_sort=True)
+
+    sorted_value = bc.decode(b'd3:bari2e3:fooi1ee')
+    unsorted_value = bc.decode(b'd3:fooi1e3:bari2ee')
+
+    assert type(sorted_value) is OrderedDict
+    assert type(unsorted_value) is OrderedDict
+
+    assert list(sorted_value.keys()) == [b'bar', b'foo']
+    assert list(unsorted_value.keys()) == [b'bar', b'foo']
+
+
+def test_dict_sorted_mixed():
+    """Ensure dictionaries with incomparable keys raise an exception when sorted."""
+    bc = Bencode(encoding='utf-8', encoding_fallback='key', dict_ordered=True, dict_ordered_sort=True)
+
+    with pytest.raises(BencodeDecodeError):
+        bc.decode(b'd3:fooi1e1:\x9ci2ee')
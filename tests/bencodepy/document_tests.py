@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - document tests."""
+
+from bencodepy import BencodeDecodeError, BencodeDecoder, BencodeDocument, bdecode, bencode
+import io
+import pytest
+
+VALUE = {
+    b'announce': b'http://tracker/announce',
+    b'info': {
+        b'name': b'example',
+        b'piece length': 16384,
+        b'pieces': b'\x00' * 200,
+        b'files': [{b'length': 1, b'path': [b'a']}, {b'length': 2, b'path': [b'b']}]
+    }
+}
+
+ENCODED = bencode(VALUE)
+
+
+def test_document_unmodified():
+    """Ensure unmodified documents are encoded unchanged."""
+    document = BencodeDocument(ENCODED)
+
+    assert document.get((b'info', b'files', 1, b'path')) == [b'b']
+    assert document[b'announce'] == b'http://tracker/announce'
+
+    assert not document.dirty
+    assert document.encode() == ENCODED
+
+
+def test_document_set():
+    """Ensure modified values are encoded."""
+    document = BencodeDocument(ENCODED)
+    document[b'announce'] = b'http://other/announce'
+    document.set(('info', 'files', 0, 'length'), 10)
+    document.set(('info', 'files', 2), {b'length': 3, b'path': [b'c']})
+    document.set(('comment',), u'example')
+
+    assert document.dirty
+    assert document.get(('info', 'files', 2, 'path', 0)) == b'c'
+
+    value = bdecode(document.encode())
+
+    assert value[b'announce'] == b'http://other/announce'
+    assert value[b'comment'] == b'example'
+    assert value[b'info'][b'files'] == [
+        {b'length': 10, b'path': [b'a']},
+        {b'length': 2, b'path': [b'b']},
+        {b'length': 3, b'path': [b'c']}
+    ]
+    assert value[b'info'][b'pieces'] == VALUE[b'info'][b'pieces']
+
+
+def test_document_splice():
+    """Ensure unmodified values are copied from the original buffer."""
+    encoded = b'd8:announce1:a4:infod3:zoo0:3:bar0:ee'
+    document = BencodeDocument(encoded)
+    document[b'announce'] = b'b'
+
+    # Unmodified (unsorted) "info" dictionary is kept as-is
+    assert document.encode() == b'd8:announce1:b4:infod3:zoo0:3:bar0:ee'
+
+
+def test_document_nested_value():
+    """Ensure replaced values can be modified."""
+    document = BencodeDocument(ENCODED)
+    document.set(('info',), {b'name': b'spam'})
+    document.set(('info', b'length'), 1)
+    document.delete(('info', 'name'))
+
+    assert document.get(('info',)) == {b'length': 1}
+    assert bdecode(document.encode()) == {b'announce': VALUE[b'announce'], b'info': {b'length': 1}}
+
+
+def test_document_set_copy():
+    """Ensure set values are copied (later changes to them don't modify the document)."""
+    document = BencodeDocument(ENCODED)
+    files = [{b'length': 1, b'path': [b'a']}]
+
+    document.set((b'info', b'files'), files)
+    document.set((b'info', b'files', 0, b'length'), 2)
+    files[0][b'path'].append(b'b')
+
+    assert files == [{b'length': 1, b'path': [b'a', b'b']}]
+    assert document.get((b'info', b'files')) == [{b'length': 2, b'path': [b'a']}]
+
+
+def test_document_get_modified():
+    """Ensure values of modified containers (and their ancestors) include edits."""
+    document = BencodeDocument(ENCODED)
+
+    document[b'announce'] = b'http://other/announce'
+    document.set((b'info', b'name'), b'renamed')
+    document.set((b'info', b'files', 2), {b'length': 3, b'path': [b'c']})
+    document.delete((b'info', b'pieces'))
+
+    value = document.get()
+
+    assert value == bdecode(document.encode())
+    assert value[b'announce'] == b'http://other/announce'
+    assert document.get((b'info',))[b'name'] == b'renamed'
+    assert document.get((b'info', b'files'))[2] == {b'length': 3, b'path': [b'c']}
+
+    # Returned values are copies
+    document.get((b'info', b'files', 2))[b'length'] = 4
+    document.get((b'info', b'files', 2, b'path')).append(b'd')
+
+    assert document.get((b'info', b'files', 2)) == {b'length': 3, b'path': [b'c']}
+
+
+@pytest.mark.parametrize('options', [
+    {'encoding': 'utf-8', 'encoding_fallback': 'all', 'encoding_rules': {'pieces': 'bytes', 'path': 'bytes'}},
+    {'compact': True},
+    {'dict_ordered': True}
+])
+def test_document_get_options(options):
+    """Ensure values of modified containers match the decoder output."""
+    decoder = BencodeDecoder(**options)
+    document = BencodeDocument(ENCODED, decoder)
+
+    document.set((b'info', b'piece length'), 32768)
+
+    assert document.get() == decoder.decode(document.encode())
+
+
+def test_document_get_rules():
+    """Ensure encoding rules of dictionary keys apply to the values returned."""
+    decoder = BencodeDecoder(encoding='utf-8', encoding_rules={'path': 'bytes'})
+    document = BencodeDocument(ENCODED, decoder)
+
+    assert document.get((b'info', b'name')) == u'example'
+    assert document.get((b'info', b'files', 0, b'path')) == [b'a']
+    assert document.get((b'info', b'files', 0, b'path', 0)) == b'a'
+
+
+def test_document_delete():
+    """Ensure values can be deleted."""
+    document = BencodeDocument(ENCODED)
+    del document[b'announce']
+    document.delete(('info', 'files', 0))
+
+    info = dict(VALUE[b'info'])
+    info[b'files'] = info[b'files'][1:]
+
+    assert bdecode(document.encode()) == {b'info': info}
+
+
+def test_document_write():
+    """Ensure documents can be written to files."""
+    document = BencodeDocument.read(io.BytesIO(ENCODED), decoder=BencodeDecoder(encoding='utf-8'))
+    document['announce'] = u'http://other/announce'
+
+    assert document['announce'] == u'http://other/announce'
+    assert document.get(('info', 'name')) == u'example'
+
+    fp = io.BytesIO()
+    document.write(fp)
+
+    assert fp.getvalue() == bencode({b'announce': b'http://other/announce', b'info': VALUE[b'info']})
+
+
+def test_document_errors():
+    """Ensure invalid documents (and paths) raise exceptions."""
+    with pytest.raises(BencodeDecodeError):
+        BencodeDocument(ENCODED[:-1])
+
+    with pytest.raises(BencodeDecodeError):
+        BencodeDocument(ENCODED + b'e')
+
+    document = BencodeDocument(ENCODED)
+
+    with pytest.raises(KeyError):
+        document.get(('missing',))
+
+    with pytest.raises(TypeError):
+        document.set(('announce', 'value'), 1)
+
+    assert document.encode() == ENCODED
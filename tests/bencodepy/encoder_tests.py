@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - encoder tests."""
+
+from bencodepy import BencodeEncoder, bencode
+import hashlib
+
+VALUE = {
+    b'name': b'example',
+    b'piece length': 16384,
+    b'pieces': b'\x01' * 100000,
+    b'files': [{b'length': i, b'path': [b'%d' % i]} for i in range(1000)]
+}
+
+
+def test_encode_to():
+    """Ensure output is written in chunks."""
+    chunks = []
+
+    BencodeEncoder().encode_to(VALUE, chunks.append, buffer_size=1024)
+
+    assert b''.join(chunks) == bencode(VALUE)
+    assert max(len(chunk) for chunk in chunks if chunk is not VALUE[b'pieces']) < 2048
+
+    # Large fragments are written without a copy
+    assert any(chunk is VALUE[b'pieces'] for chunk in chunks)
+
+
+def test_digest():
+    """Ensure digests match the encoded output."""
+    encoder = BencodeEncoder()
+
+    assert encoder.digest(VALUE) == hashlib.sha1(bencode(VALUE)).digest()
+    assert encoder.digest(42, 'md5') == hashlib.md5(b'i42e').digest()
+
+
+def test_digest_multiple():
+    """Ensure multiple digests are computed in a single pass."""
+    assert BencodeEncoder().digest(VALUE, ('sha1', 'sha256')) == (
+        hashlib.sha1(bencode(VALUE)).digest(),
+        hashlib.sha256(bencode(VALUE)).digest()
+    )
+
+
+def test_encode_buffers():
+    """Ensure binary buffers are encoded as strings (and written without a copy)."""
+    pieces = bytearray(b'\x01' * 100000)
+    value = {b'pieces': pieces, b'view': memoryview(b'spam'), b'words': memoryview(bytearray(8)).cast('H')}
+
+    assert bencode(value) == b'd6:pieces100000:' + bytes(pieces) + b'4:view4:spam5:words8:' + b'\x00' * 8 + b'e'
+
+    chunks = []
+    BencodeEncoder().encode_to(value, chunks.append)
+
+    assert any(chunk is pieces for chunk in chunks)
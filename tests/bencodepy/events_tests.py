@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - event parser tests."""
+
+from bencodepy import BencodeDecodeError, bencode
+from bencodepy.events import iterparse, parse
+import io
+import pytest
+
+VALUE = {
+    b'announce': b'http://tracker/announce',
+    b'files': [{b'length': -1, b'path': [b'a', b'']}, {}],
+    b'count': 0
+}
+
+EVENTS = [
+    ('start_dict', None),
+    ('key', b'announce'), ('bytes', b'http://tracker/announce'),
+    ('key', b'count'), ('int', 0),
+    ('key', b'files'), ('start_list', None),
+    ('start_dict', None),
+    ('key', b'length'), ('int', -1),
+    ('key', b'path'), ('start_list', None), ('bytes', b'a'), ('bytes', b''), ('end', None),
+    ('end', None),
+    ('start_dict', None), ('end', None),
+    ('end', None),
+    ('end', None)
+]
+
+
+def test_iterparse_buffer():
+    """Ensure events are generated from buffers."""
+    assert list(iterparse(bytearray(bencode(VALUE)))) == EVENTS
+
+
+def test_iterparse_stream():
+    """Ensure events are generated from streams (read in chunks)."""
+    for chunk_size in (1, 3, 7, 64):
+        assert list(iterparse(io.BytesIO(bencode(VALUE)), chunk_size=chunk_size)) == EVENTS
+
+
+def test_iterparse_file(tmpdir):
+    """Ensure events are generated from paths and files."""
+    path = tmpdir.join('value.torrent')
+    path.write_binary(bencode(VALUE))
+
+    assert list(iterparse(str(path))) == EVENTS
+
+    with open(str(path), 'rb') as fp:
+        assert list(iterparse(fp)) == EVENTS
+
+
+def test_iterparse_memoryview():
+    """Ensure byte strings are delivered as memoryview slices."""
+    x = bytearray(bencode([b'spam', 1]))
+    events = list(iterparse(x, memoryview=True))
+
+    assert isinstance(events[1][1], memoryview)
+    assert events[1][1].tobytes() == b'spam'
+    assert events[2] == ('int', 1)
+
+
+def test_iterparse_scalar():
+    """Ensure top-level scalars are parsed."""
+    assert list(iterparse(io.BytesIO(b'i42e'))) == [('int', 42)]
+    assert list(iterparse(io.BytesIO(b'4:spam'), chunk_size=1)) == [('bytes', b'spam')]
+
+
+def test_iterparse_lazy():
+    """Ensure events are generated before the end of the input is read."""
+    events = iterparse(io.BytesIO(b'li1ei2e' + b'x' * 10), chunk_size=4)
+
+    assert next(events) == ('start_list', None)
+    assert next(events) == ('int', 1)
+
+
+@pytest.mark.parametrize('value', [
+    b'', b'l', b'i1', b'i01e', b'i-0e', b'5:spam', b'02:ab', b'd1:ae', b'di1ei2ee', b'e', b'x',
+    b'le' + b'x', b'i1ei2e'
+])
+def test_iterparse_invalid(value):
+    """Ensure invalid input is rejected."""
+    with pytest.raises(BencodeDecodeError):
+        list(iterparse(bytearray(value)))
+
+    with pytest.raises(BencodeDecodeError):
+        list(iterparse(io.BytesIO(value), chunk_size=1))
+
+
+def test_parse():
+    """Ensure handler methods are called for each event."""
+    class Handler(object):
+        def __init__(self):
+            self.depth = 0
+            self.max_depth = 0
+            self.total = 0
+
+        def start_list(self):
+            self.depth += 1
+            self.max_depth = max(self.depth, self.max_depth)
+
+        def end(self):
+            self.depth -= 1
+
+        def int(self, value):
+            self.total += value
+
+    handler = Handler()
+    parse(io.BytesIO(bencode([[1, 2], [3, [4]]])), handler)
+
+    assert handler.depth == 0
+    assert handler.max_depth == 3
+    assert handler.total == 10
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - sidecar index tests."""
+
+from bencodepy import BencodeDecodeError, BencodeDecoder, bencode
+from bencodepy.index import BencodeIndex, _spans_from_bytes, _spans_to_bytes
+import os
+import pytest
+
+VALUE = {
+    b'alpha': {b'length': 12, b'path': [b'a', b'b']},
+    b'beta': [1, 2, 3],
+    b'gamma': b'spam'
+}
+
+
+def _write(tmpdir, value, name='resume.dat'):
+    path = tmpdir.join(name)
+    path.write_binary(bencode(value))
+    return str(path)
+
+
+def test_index_dict(tmpdir):
+    """Ensure dictionary entries are decoded by key."""
+    path = _write(tmpdir, VALUE)
+
+    with BencodeIndex(path) as index:
+        assert len(index) == 3
+        assert list(index) == [b'alpha', b'beta', b'gamma']
+
+        assert index[b'alpha'] == VALUE[b'alpha']
+        assert index['beta'] == [1, 2, 3]
+        assert index.get('delta') is None
+
+        assert 'gamma' in index
+        assert 'delta' not in index
+
+        offset, length = index.span('gamma')
+        assert open(path, 'rb').read()[offset:offset + length] == b'4:spam'
+
+    assert os.path.exists(path + '.idx')
+
+
+def test_index_list(tmpdir):
+    """Ensure list entries are decoded by position."""
+    path = _write(tmpdir, [VALUE, 1, b'two'])
+
+    with BencodeIndex(path, decoder=BencodeDecoder(encoding='utf-8')) as index:
+        assert len(index) == 3
+        assert index[0][u'gamma'] == u'spam'
+        assert index[-1] == u'two'
+
+        with pytest.raises(IndexError):
+            index[3]
+
+
+def test_index_reused(tmpdir):
+    """Ensure existing indexes are loaded (without scanning the file)."""
+    path = _write(tmpdir, VALUE)
+    BencodeIndex.build(path).close()
+
+    with BencodeIndex(path, rebuild=False) as index:
+        assert index._loaded
+        assert index[b'beta'] == [1, 2, 3]
+
+
+def test_index_stale(tmpdir):
+    """Ensure indexes are rebuilt when the file has changed."""
+    path = _write(tmpdir, VALUE)
+    BencodeIndex.build(path).close()
+
+    _write(tmpdir, {b'beta': [4], b'zeta': 0})
+
+    with pytest.raises(BencodeDecodeError):
+        BencodeIndex(path, rebuild=False)
+
+    with BencodeIndex(path) as index:
+        assert not index._loaded
+        assert list(index) == [b'beta', b'zeta']
+        assert index[b'beta'] == [4]
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda data: data.pop(b'kind'),
+    lambda data: data.update({b'kind': b'x'}),
+    lambda data: data.update({b'spans': data[b'spans'][:-3]}),
+    lambda data: data.update({b'keys': data[b'keys'][:-1]}),
+    lambda data: data.update({b'spans': 0})
+])
+def test_index_corrupt(tmpdir, corrupt):
+    """Ensure corrupt indexes (matching the size and modification time of the file) are rebuilt."""
+    path = _write(tmpdir, VALUE)
+    BencodeIndex.build(path).close()
+
+    with open(path + '.idx', 'rb') as fp:
+        data = BencodeDecoder().decode(fp.read())
+
+    corrupt(data)
+
+    with open(path + '.idx', 'wb') as fp:
+        fp.write(bencode(data))
+
+    with pytest.raises(BencodeDecodeError):
+        BencodeIndex(path, rebuild=False)
+
+    with BencodeIndex(path) as index:
+        assert not index._loaded
+        assert index[b'beta'] == [1, 2, 3]
+
+
+def test_index_modified_while_building(tmpdir, monkeypatch):
+    """Ensure files modified while they are scanned leave the index stale."""
+    path = _write(tmpdir, VALUE)
+    scan = BencodeDecoder.scan
+
+    def modify_and_scan(self, x, f=0):
+        result = scan(self, x, f)
+
+        with open(path, 'r+b') as fp:
+            fp.write(b'd5:alpha')
+
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+
+        return result
+
+    monkeypatch.setattr(BencodeDecoder, 'scan', modify_and_scan)
+    BencodeIndex.build(path).close()
+    monkeypatch.undo()
+
+    with pytest.raises(BencodeDecodeError):
+        BencodeIndex(path, rebuild=False)
+
+
+def test_index_spans_bytes():
+    """Ensure spans are packed as little-endian 64-bit integers (without tobytes/frombytes on Python 2)."""
+    data = _spans_to_bytes([1, 2 ** 40])
+
+    assert data == b'\x01' + b'\x00' * 7 + b'\x00' * 5 + b'\x01' + b'\x00' * 2
+    assert list(_spans_from_bytes(data)) == [1, 2 ** 40]
+
+
+def test_index_path(tmpdir):
+    """Ensure the index is written to ``index_path``."""
+    path = _write(tmpdir, VALUE)
+    index_path = str(tmpdir.join('resume.index'))
+
+    BencodeIndex(path, index_path).close()
+
+    assert os.path.exists(index_path)
+    assert not os.path.exists(path + '.idx')
+
+
+def test_index_invalid(tmpdir):
+    """Ensure invalid files are rejected."""
+    with pytest.raises(BencodeDecodeError):
+        BencodeIndex(_write(tmpdir, b'spam'))
+
+    path = tmpdir.join('trailing.dat')
+    path.write_binary(bencode(VALUE) + b'x')
+
+    with pytest.raises(BencodeDecodeError):
+        BencodeIndex(str(path))
+
+    path = tmpdir.join('empty.dat')
+    path.write_binary(b'')
+
+    with pytest.raises(BencodeDecodeError):
+        BencodeIndex(str(path))
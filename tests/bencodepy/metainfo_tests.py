@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - metainfo builder tests."""
+
+from bencodepy import BencodeEncoder, bdecode, bencode, bread, bwrite
+from bencodepy.metainfo import collect_files, create, hash_pieces, piece_length_for
+import hashlib
+import os
+import pytest
+
+
+def pieces_of(data, piece_length):
+    return b''.join(hashlib.sha1(data[i:i + piece_length]).digest() for i in range(0, len(data), piece_length))
+
+
+@pytest.fixture
+def payload(tmpdir):
+    root = tmpdir.mkdir('payload')
+    root.mkdir('sub').join('b.bin').write_binary(b'b' * 70000)
+    root.join('a.bin').write_binary(b'a' * 50001)
+    root.join('empty').write_binary(b'')
+    root.join('sub').join('c.bin').write_binary(os.urandom(12345))
+    return root
+
+
+def test_collect_files(payload):
+    """Ensure payload files are listed in order (with paths relative to the payload)."""
+    files = collect_files(str(payload))
+
+    assert [(components, size) for components, size, _ in files] == [
+        (['a.bin'], 50001), (['empty'], 0), (['sub', 'b.bin'], 70000), (['sub', 'c.bin'], 12345)
+    ]
+
+    assert collect_files(str(payload.join('a.bin'))) == [([], 50001, str(payload.join('a.bin')))]
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+@pytest.mark.parametrize('piece_length', [16384, 32768, 200000])
+def test_hash_pieces(payload, threads, piece_length):
+    """Ensure pieces spanning file boundaries are hashed (in parallel) like the concatenated payload."""
+    files = collect_files(str(payload))
+    data = b''.join(open(path, 'rb').read() for _, _, path in files)
+
+    pieces = hash_pieces(files, piece_length, threads, min_size=0)
+
+    assert isinstance(pieces, bytearray)
+    assert pieces == pieces_of(data, piece_length)
+
+
+def test_hash_pieces_invalid(payload):
+    """Ensure invalid piece lengths are rejected."""
+    with pytest.raises(ValueError):
+        hash_pieces(collect_files(str(payload)), 0)
+
+
+def test_piece_length_for():
+    """Ensure piece lengths are selected from the payload size."""
+    assert piece_length_for(0) == 16 * 1024
+    assert piece_length_for(1024 * 1024 * 1024) == 512 * 1024
+    assert piece_length_for(1024 ** 4) == 16 * 1024 * 1024
+
+
+def test_create(payload, tmpdir):
+    """Ensure multi-file metainfo is created (and written without a copy of the piece table)."""
+    metainfo = create(str(payload), 'http://tracker/announce', piece_length=32768, private=True,
+                      comment=u'caf\xe9', creation_date=1500000000, threads=2)
+
+    info = metainfo[b'info']
+
+    assert info[b'name'] == b'payload'
+    assert info[b'private'] == 1
+    assert info[b'files'][2] == {b'length': 70000, b'path': [b'sub', b'b.bin']}
+    assert len(info[b'pieces']) == 20 * 5
+
+    path = str(tmpdir.join('payload.torrent'))
+    bwrite(metainfo, path)
+
+    assert bread(path) == metainfo
+    assert bread(path)[b'comment'] == u'caf\xe9'.encode('utf-8')
+
+    chunks = []
+    BencodeEncoder().encode_to(info, chunks.append, buffer_size=64)
+
+    assert any(chunk is info[b'pieces'] for chunk in chunks)
+
+    with open(path, 'rb') as fp:
+        assert BencodeEncoder().digest(info) == hashlib.sha1(bencode(bdecode(fp.read())[b'info'])).digest()
+
+
+def test_create_single_file(payload):
+    """Ensure single-file metainfo is created."""
+    metainfo = create(str(payload.join('a.bin')), announce_list=[['http://a'], ['http://b', 'http://c']])
+
+    assert metainfo[b'announce-list'] == [[b'http://a'], [b'http://b', b'http://c']]
+    assert metainfo[b'info'] == {
+        b'name': b'a.bin',
+        b'length': 50001,
+        b'piece length': 16384,
+        b'pieces': pieces_of(b'a' * 50001, 16384)
+    }
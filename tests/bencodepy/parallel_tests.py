@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - parallel decoder tests."""
+
+from bencodepy import Bencode, BencodeDecodeError, BencodeDecoder, bencode, decode_parallel
+import pytest
+
+VALUE = {
+    b'torrent-%04d' % i: {b'name': b'Example %d' % i, b'size': i * 1024, b'files': [b'a', b'b']}
+    for i in range(200)
+}
+
+
+def test_decode_parallel_dict():
+    """Ensure parallel decoding gives the same result as the serial decoder."""
+    encoded = bencode(VALUE)
+
+    assert decode_parallel(encoded, processes=2, min_size=0) == VALUE
+
+
+def test_decode_parallel_list():
+    """Ensure list children are reassembled in order."""
+    value = [i for i in range(500)] + [b'spam', [b'nested']]
+
+    assert decode_parallel(bencode(value), processes=2, min_size=0) == value
+
+
+def test_decode_parallel_ordered():
+    """Ensure decoder options are applied by workers, and to the reassembled container."""
+    bc = Bencode(encoding='utf-8', dict_ordered=True, dict_ordered_sort=True)
+    encoded = bencode(VALUE)
+
+    assert bc.decode_parallel(encoded, processes=2) == bc.decode(encoded)
+
+    result = decode_parallel(encoded, bc.decoder, processes=2, min_size=0)
+
+    assert result == bc.decode(encoded)
+    assert list(result.keys()) == list(bc.decode(encoded).keys())
+
+
+@pytest.mark.parametrize('processes', [2, 3, 7])
+def test_decode_parallel_misaligned(processes):
+    """Ensure runs starting inside children are aligned, and misaligned runs (inside strings) are decoded serially."""
+    value = {
+        b'%04d' % i: [b'4:spami1ee' * (i % 5), {b'd': b'le%d:' % i}, [[i, b'ee']], b'x' * (i % 300)]
+        for i in range(300)
+    }
+    encoded = bencode(value)
+
+    assert decode_parallel(encoded, processes=processes, min_size=0) == value
+    assert decode_parallel(bencode(list(value.values())), processes=processes, min_size=0) == list(value.values())
+
+    # Runs starting inside these strings skip past the end of the value
+    strings = [b'9' * 20 + b':4:spam' + b'1:x' * (i % 7) for i in range(300)]
+
+    assert decode_parallel(bencode(strings), processes=processes, min_size=0) == strings
+
+
+def test_decode_parallel_rules():
+    """Ensure encoding rules are applied to the children of the top-level container."""
+    value = {b'name': b'\xff' + b'x' * 100, b'peers': b'\x7f\x00\x00\x01\x1a\xe1' * 50}
+    value.update((b'torrent-%04d' % i, {b'name': b'Example %d' % i}) for i in range(100))
+
+    bc = Bencode(encoding='utf-8', encoding_fallback='value', encoding_rules={'peers': 'peers', 'name': 'bytes'})
+    encoded = bencode(value)
+    result = decode_parallel(encoded, bc.decoder, processes=2, min_size=0)
+
+    assert result == bc.decode(encoded)
+    assert result['name'] == value[b'name']
+    assert list(result['peers']) == [('127.0.0.1', 6881)] * 50
+    assert result['torrent-0001'] == {'name': b'Example 1'}
+
+
+def test_decode_parallel_scalar():
+    """Ensure non-container values are decoded serially."""
+    assert decode_parallel(b'i42e', processes=2, min_size=0) == 42
+
+
+def test_decode_parallel_errors():
+    """Ensure invalid values raise a decode error."""
+    encoded = bencode(VALUE)
+
+    with pytest.raises(BencodeDecodeError):
+        decode_parallel(encoded[:-10], processes=2, min_size=0)
+
+    with pytest.raises(BencodeDecodeError):
+        decode_parallel(encoded + b'i1e', processes=2, min_size=0)
+
+    with pytest.raises(BencodeDecodeError):
+        decode_parallel(b'l' + b'i01e' * 10 + b'e', processes=2, min_size=0)
+
+
+@pytest.mark.parametrize('suffix', [b'3:zzzxe', b'3:zzzi1xee'])
+def test_decode_parallel_late_errors(suffix):
+    """Ensure errors found after earlier batches were dispatched (while scanning, or by workers) are raised."""
+    with pytest.raises(BencodeDecodeError):
+        decode_parallel(bencode(VALUE)[:-1] + suffix, processes=2, min_size=0)
+
+
+def test_scan():
+    """Ensure child boundaries are found without decoding."""
+    encoded = b'd3:bar4:spam3:fooli1eee'
+    children, end = BencodeDecoder().scan(encoded)
+
+    assert end == len(encoded)
+    assert children == [(b'bar', 6, 12), (b'foo', 17, 22)]
+
+
+@pytest.mark.parametrize('options,error', [
+    ({'max_depth': 2}, 'max_depth'),
+    ({'max_items': 100}, 'max_items'),
+    ({'max_size': 100}, 'max_size')
+])
+def test_decode_parallel_budgets(options, error):
+    """Ensure resource budgets apply to the whole value."""
+    decoder = Bencode(**options).decoder
+
+    with pytest.raises(BencodeDecodeError, match=error):
+        decode_parallel(bencode(VALUE), decoder, processes=2, min_size=0)
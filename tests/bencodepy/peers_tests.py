@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - compact peer and node tests."""
+
+from bencodepy import Bencode, BencodeDecodeError, BencodeDecoder, bencode
+from bencodepy.events import decode_stream
+from bencodepy.peers import CompactPeers
+from bencodepy.shapes import ShapeDecoder
+from bencodepy.transcode import to_json
+import io
+import json
+import pytest
+import socket
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PEERS = [('10.0.0.%d' % i, 6881 + i) for i in range(1, 50)] + [('255.255.255.255', 65535)]
+
+PEERS6 = [('2001:db8::%x' % i, 51413 - i) for i in range(1, 20)]
+
+NODES = [(bytes(bytearray([i] * 20)), '192.168.%d.%d' % (i, 255 - i), 1024 + i) for i in range(16)]
+
+
+def pack_peers(peers):
+    return b''.join(socket.inet_aton(host) + struct.pack('!H', port) for host, port in peers)
+
+
+def pack_peers6(peers):
+    return b''.join(socket.inet_pton(socket.AF_INET6, host) + struct.pack('!H', port) for host, port in peers)
+
+
+def pack_nodes(nodes):
+    return b''.join(node_id + socket.inet_aton(host) + struct.pack('!H', port) for node_id, host, port in nodes)
+
+
+def test_peers():
+    """Ensure compact IPv4 peers are expanded into columns."""
+    peers = CompactPeers(pack_peers(PEERS))
+
+    assert len(peers) == len(PEERS)
+    assert list(peers) == PEERS
+    assert peers[0] == PEERS[0]
+    assert peers[-1] == ('255.255.255.255', 65535)
+
+    assert peers.ids is None
+    assert list(peers.addresses) == [struct.unpack('!I', socket.inet_aton(host))[0] for host, _ in PEERS]
+    assert list(peers.ports) == [port for _, port in PEERS]
+    assert peers.hosts() == [host for host, _ in PEERS]
+
+    with pytest.raises(IndexError):
+        peers[len(PEERS)]
+
+
+def test_peers6():
+    """Ensure compact IPv6 peers are expanded into columns."""
+    peers = CompactPeers(pack_peers6(PEERS6), 'peers6')
+
+    assert list(peers) == PEERS6
+    assert peers[3] == PEERS6[3]
+    assert peers.addresses[0] == socket.inet_pton(socket.AF_INET6, PEERS6[0][0])
+    assert list(peers.ports) == [port for _, port in PEERS6]
+
+
+@pytest.mark.parametrize('kind,pack,entries', [
+    ('nodes', pack_nodes, NODES),
+    ('nodes6', lambda nodes: b''.join(n + pack_peers6([(h, p)]) for n, h, p in nodes), [
+        (node_id, '2001:db8::%x' % port, port) for node_id, _, port in NODES
+    ])
+])
+def test_nodes(kind, pack, entries):
+    """Ensure compact nodes are expanded into columns (with node IDs)."""
+    nodes = CompactPeers(pack(entries), kind)
+
+    assert list(nodes) == entries
+    assert nodes[5] == entries[5]
+    assert list(nodes.ids) == [node_id for node_id, _, _ in entries]
+    assert nodes.ids[-1] == entries[-1][0]
+    assert list(nodes.ports) == [port for _, _, port in entries]
+
+
+def test_invalid():
+    """Ensure invalid lengths and kinds are rejected."""
+    with pytest.raises(ValueError):
+        CompactPeers(b'\x00' * 7)
+
+    with pytest.raises(ValueError):
+        CompactPeers(b'\x00' * 26, 'nodes6')
+
+    with pytest.raises(ValueError):
+        CompactPeers(b'', 'spam')
+
+    assert len(CompactPeers(b'')) == 0
+
+
+def test_encoding_rules():
+    """Ensure known compact keys are wrapped by the decoder (and expanded lazily)."""
+    decoder = BencodeDecoder(encoding_rules={'peers': 'peers', 'nodes': 'nodes', 'values': 'peers'})
+
+    value = {
+        b'interval': 1800,
+        b'peers': pack_peers(PEERS),
+        b'r': {b'nodes': pack_nodes(NODES), b'values': [pack_peers(PEERS[:1]), pack_peers(PEERS[1:2])]}
+    }
+
+    result = decoder.decode(bencode(value))
+
+    assert isinstance(result[b'peers'], CompactPeers)
+    assert result[b'peers']._columns is None
+    assert list(result[b'peers']) == PEERS
+    assert list(result[b'r'][b'nodes']) == NODES
+    assert [list(peers) for peers in result[b'r'][b'values']] == [PEERS[:1], PEERS[1:2]]
+
+    # Compact entries compare equal to (and are encoded as) their strings
+    assert result == value
+    assert bencode(result) == bencode(value)
+
+    assert decode_stream(io.BytesIO(bencode(value)), decoder, 16) == result
+    assert ShapeDecoder(decoder).decode(bencode(value)) == result
+
+    with pytest.raises(BencodeDecodeError):
+        decoder.decode(bencode({b'peers': b'\x00' * 7}))
+
+    # Invalid lengths are reported (not raised) within budgets
+    data, error = Bencode(max_size=100, encoding_rules={'peers': 'peers'}).try_decode(b'd5:peers1:xe')
+
+    assert data is None
+    assert isinstance(error, BencodeDecodeError)
+
+    with pytest.raises(ValueError):
+        BencodeDecoder(encoding_rules={'peers': 'spam'})
+
+
+def test_to_json():
+    """Ensure strings of keys with compact rules are transcoded as binary."""
+    decoder = BencodeDecoder(encoding_rules={'peers': 'peers'})
+    value = {b'peers': b'abcdef'}
+
+    assert json.loads(to_json(bytearray(bencode(value)), decoder=decoder, binary='hex')) == {'peers': '616263646566'}
+
+
+@pytest.mark.skipif(numpy is None, reason='NumPy not available')
+def test_to_numpy():
+    """Ensure entries are returned as NumPy structured arrays."""
+    nodes = CompactPeers(pack_nodes(NODES), 'nodes').to_numpy()
+
+    assert nodes['port'].tolist() == [port for _, _, port in NODES]
+    assert nodes['id'].tolist() == [node_id for node_id, _, _ in NODES]
+    assert nodes['address'][1] == struct.unpack('!I', socket.inet_aton(NODES[1][1]))[0]
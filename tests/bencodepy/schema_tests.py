@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - schema tests."""
+
+from bencodepy import BencodeDecodeError, bencode
+from bencodepy.schema import Field, ListOf, Schema
+import pytest
+
+QUERY = Schema('Query', [
+    Field('t', bytes),
+    Field('y', bytes, choices=(b'q', b'r', b'e')),
+    Field('q', bytes, required=False),
+    Field('a', Schema('Arguments', [
+        Field('id', bytes),
+        Field('info_hash', bytes, required=False),
+        Field('port', int, required=False, default=6881),
+    ]), required=False),
+    Field('version', None, required=False, key='v')
+])
+
+PING = bencode({b't': b'aa', b'y': b'q', b'q': b'ping', b'a': {b'id': b'0' * 20}})
+
+
+def test_schema_decode():
+    """Ensure messages are decoded into schema types."""
+    message = QUERY.compile().decode(PING)
+
+    assert message.t == b'aa'
+    assert message.y == b'q'
+    assert message.q == b'ping'
+    assert message.a.id == b'0' * 20
+    assert message.a.info_hash is None
+    assert message.a.port == 6881
+    assert message.version is None
+
+
+def test_schema_unknown_keys():
+    """Ensure unknown keys are skipped."""
+    encoded = bencode({
+        b't': b'aa', b'y': b'r', b'v': [1, b'x'],
+        b'r': {b'id': b'1' * 20, b'nodes': b'2' * 26}, b'ip': b'1234'
+    })
+
+    message = QUERY.compile().decode(encoded)
+
+    assert message.y == b'r'
+    assert message.a is None
+    assert message.version == [1, b'x']
+
+
+def test_schema_list():
+    """Ensure lists are decoded."""
+    schema = Schema('Metainfo', [
+        Field('announce_list', ListOf(ListOf(str)), key='announce-list'),
+        Field('piece_length', int, key='piece length')
+    ])
+
+    metainfo = schema.compile().decode(bencode({
+        b'announce-list': [[b'http://a'], [b'http://b', b'http://c']],
+        b'piece length': 16384
+    }))
+
+    assert metainfo.announce_list == [[u'http://a'], [u'http://b', u'http://c']]
+    assert metainfo.piece_length == 16384
+
+
+def test_schema_errors():
+    """Ensure invalid messages are rejected."""
+    decoder = QUERY.compile()
+
+    with pytest.raises(BencodeDecodeError, match='missing field "Query.t"'):
+        decoder.decode(b'd1:y1:qe')
+
+    with pytest.raises(BencodeDecodeError, match='expected string'):
+        decoder.decode(b'd1:ti1ee')
+
+    with pytest.raises(BencodeDecodeError, match='expected dict'):
+        decoder.decode(b'l1:ti1ee')
+
+    with pytest.raises(BencodeDecodeError, match='Query.y'):
+        decoder.decode(b'd1:t2:aa1:y1:xe')
+
+    with pytest.raises(BencodeDecodeError, match='expected int'):
+        decoder.decode(b'd1:ad2:id1:x4:port4:6881ee')
+
+    with pytest.raises(BencodeDecodeError):
+        decoder.decode(PING[:-1])
+
+    with pytest.raises(BencodeDecodeError):
+        decoder.decode(PING + b'e')
+
+
+@pytest.mark.parametrize('value', [b'd1:zi1e-6:e', b'd1:t2:aa+1:ye', b'd01:t2:aae', b'd1:t9:aae'])
+def test_schema_invalid_keys(value):
+    """Ensure keys with invalid lengths are rejected (without moving backwards)."""
+    with pytest.raises(BencodeDecodeError):
+        Schema('Q', [Field('t', bytes, required=False)]).compile().decode(value)
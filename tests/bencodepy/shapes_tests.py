@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - shape-learning decoder tests."""
+
+from bencodepy import BencodeDecodeError, BencodeDecoder, bencode
+from bencodepy.shapes import SAMPLE_SIZE, ShapeDecoder
+import pytest
+
+PING = bencode({b't': b'aa', b'y': b'q', b'q': b'ping', b'a': {b'id': b'abcdefghij0123456789'}})
+PING_2 = bencode({b't': b'bb', b'y': b'q', b'q': b'ping', b'a': {b'id': b'mnopqrstuvwxyz123456'}})
+
+MESSAGES = [
+    bencode({b'n': 0, b's': b'', b'l': [1, -20, [b'ab', {}]], b'd': {b'x': [], b'y': 300}}),
+    bencode({b'n': 12, b's': b'', b'l': [7, 300, [b'cd', {}]], b'd': {b'x': [], b'y': -1}}),
+    bencode({b'n': 0, b's': u'caf\xe9'.encode('utf-8'), b'l': [], b'd': {}}),
+    bencode({b'n': 0, b's': b'\xff\xfe\xfd\xfc\xfb', b'l': [], b'd': {}}),
+    bencode({b'path': [b'a', b'b'], b'pieces': b'\x00\xff'}),
+    bencode({b'path': [b'c', b'd'], b'pieces': b'\xfe\x01'}),
+    bencode([b'z', b'a'])
+]
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'encoding': 'utf-8', 'encoding_fallback': 'all'},
+    {'encoding': 'utf-8', 'encoding_fallback': 'all', 'encoding_rules': {'pieces': 'bytes', 'path': 'text'}},
+    {'dict_ordered': True},
+    {'dict_ordered': True, 'dict_ordered_sort': True},
+    {'compact': True}
+])
+def test_decode_matches_decoder(options):
+    """Ensure decoded values match the decoder (for learned and unknown shapes)."""
+    decoder = ShapeDecoder(BencodeDecoder(**options))
+
+    for _ in range(3):
+        for message in MESSAGES:
+            expected = BencodeDecoder(**options).decode(message)
+            result = decoder.decode(message)
+
+            assert result == expected
+            assert type(result) is type(expected)
+
+    assert decoder.info().hits > 0
+
+
+def test_decode_hits():
+    """Ensure repeated shapes are decoded from learned shapes."""
+    decoder = ShapeDecoder()
+
+    assert decoder.decode(PING)[b'q'] == b'ping'
+    assert decoder.decode(PING)[b't'] == b'aa'
+    assert decoder.info() == (0, 2, 0, 1)
+
+    assert decoder.decode(PING_2)[b'a'][b'id'] == b'mnopqrstuvwxyz123456'
+    assert decoder.info() == (1, 2, 0, 1)
+
+
+@pytest.mark.parametrize('value', [
+    b'd1:ai05ee',
+    b'd1:ai-0ee',
+    b'd1:ai5e',
+    b'd1:ai5eex',
+    b'd1:a3:abe'
+])
+def test_decode_invalid(value):
+    """Ensure invalid messages (similar to learned shapes) are rejected."""
+    decoder = ShapeDecoder()
+
+    for _ in range(2):
+        assert decoder.decode(b'd1:ai5ee') == {b'a': 5}
+
+    with pytest.raises(BencodeDecodeError):
+        decoder.decode(value)
+
+
+def test_decode_invalid_text():
+    """Ensure strings that can't be decoded with the encoding are rejected."""
+    decoder = ShapeDecoder(BencodeDecoder(encoding='utf-8'))
+
+    for _ in range(2):
+        assert decoder.decode(b'd1:a2:abe') == {u'a': u'ab'}
+
+    with pytest.raises(BencodeDecodeError):
+        decoder.decode(b'd1:a2:\xff\xfee')
+
+
+def test_evictions():
+    """Ensure least recently used shapes are evicted."""
+    decoder = ShapeDecoder(max_shapes=2)
+
+    for message in (b'li1ee', b'li1ee', b'l1:ae', b'l1:ae', b'li1ee', b'le', b'le'):
+        decoder.decode(message)
+
+    assert decoder.info().evictions == 1
+    assert decoder.info().shapes == 2
+
+    decoder.decode(b'li1ee')
+    assert decoder.info().hits == 2
+
+    decoder.clear()
+    assert decoder.info().shapes == 0
+
+
+def test_max_fields():
+    """Ensure messages with too many fields aren't learned."""
+    decoder = ShapeDecoder(max_fields=2)
+
+    for _ in range(2):
+        decoder.decode(b'li1ei2ei3ee')
+
+    assert decoder.info().shapes == 0
+
+
+def test_bypass():
+    """Ensure shapes are bypassed for streams without repetitive messages."""
+    decoder = ShapeDecoder()
+
+    for i in range(SAMPLE_SIZE):
+        decoder.decode(bencode([0] * (i % 200)))
+
+    assert decoder._bypass == SAMPLE_SIZE
+
+    for _ in range(SAMPLE_SIZE):
+        decoder.decode(PING)
+
+    assert decoder._bypass == 0
+    assert decoder.info().hits == 0
+
+    for _ in range(SAMPLE_SIZE):
+        decoder.decode(PING)
+
+    assert decoder.info().hits == SAMPLE_SIZE - 2
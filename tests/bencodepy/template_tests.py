@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - template tests."""
+
+from bencodepy import bencode
+from bencodepy.template import BencodeTemplate, Hole
+import pytest
+
+RESPONSE = BencodeTemplate({
+    'complete': Hole('complete', 'int'),
+    'incomplete': Hole('incomplete', 'int'),
+    'interval': 1800,
+    'peers': Hole('peers', 'bytes')
+})
+
+
+def test_template_render():
+    """Ensure rendered templates match the encoder output."""
+    for complete, incomplete, peers in [(0, 0, b''), (12, 5000, b'\x7f\x00\x00\x01\x1a\xe1'), (-5, 2 ** 40, u'x')]:
+        assert RESPONSE.render(complete=complete, incomplete=incomplete, peers=peers) == bencode({
+            'complete': complete,
+            'incomplete': incomplete,
+            'interval': 1800,
+            'peers': peers
+        })
+
+
+def test_template_nested():
+    """Ensure nested shapes (and "any" holes) are rendered."""
+    template = BencodeTemplate({
+        't': Hole('t', 'bytes'),
+        'y': 'r',
+        'r': {'id': Hole('id', 'bytes'), 'values': [Hole('values')]}
+    })
+
+    value = {'t': b'aa', 'y': 'r', 'r': {'id': b'0' * 20, 'values': [[b'abcdef', b'ghijkl']]}}
+
+    assert template.render(t=b'aa', id=b'0' * 20, values=[b'abcdef', b'ghijkl']) == bencode(value)
+
+
+def test_template_missing():
+    """Ensure missing values raise an exception."""
+    with pytest.raises(KeyError):
+        RESPONSE.render(complete=1, incomplete=2)
+
+
+def test_template_invalid():
+    """Ensure invalid hole types raise an exception."""
+    with pytest.raises(ValueError):
+        Hole('peers', 'str')
+
+
+@pytest.mark.parametrize('value', [1800.9, '1800', None])
+def test_template_int_type(value):
+    """Ensure int holes reject values that aren't integers."""
+    with pytest.raises(TypeError):
+        BencodeTemplate({'interval': Hole('interval', 'int')}).render(interval=value)
+
+    assert BencodeTemplate({'interval': Hole('interval', 'int')}).render(interval=True) == b'd8:intervali1ee'
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""bencode.py - transcoder tests."""
+
+from bencodepy import BencodeDecodeError, BencodeDecoder, bencode
+from bencodepy.events import iterparse
+from bencodepy.transcode import JsonTranscoder, to_json
+import io
+import json
+import os
+import pytest
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+VALUE = {
+    b'name': u'caf\xe9'.encode('utf-8'),
+    b'pieces': b'\x9c\x00\xff',
+    b'files': [{b'length': -1, b'path': [b'a', b'b']}, {}],
+    b'empty': []
+}
+
+
+def test_to_json():
+    """Ensure JSON matches the decoded value."""
+    assert json.loads(to_json(bytearray(bencode(VALUE)))) == {
+        u'empty': [],
+        u'files': [{u'length': -1, u'path': [u'a', u'b']}, {}],
+        u'name': u'caf\xe9',
+        u'pieces': u'nAD/'
+    }
+
+
+@pytest.mark.parametrize('binary,expected', [
+    ('base64', u'nAD/'),
+    ('hex', u'9c00ff'),
+    ('latin-1', u'\x9c\x00\xff')
+])
+def test_to_json_binary(binary, expected):
+    """Ensure binary strings are encoded."""
+    assert json.loads(to_json(bytearray(bencode(VALUE)), binary=binary))[u'pieces'] == expected
+
+
+def test_to_json_rules():
+    """Ensure strings with a "bytes" rule are always encoded as binary."""
+    decoder = BencodeDecoder(encoding_rules={'name': 'bytes', 'path': 'bytes'})
+    value = json.loads(to_json(bytearray(bencode(VALUE)), decoder=decoder, binary='hex'))
+
+    assert value[u'name'] == u'636166c3a9'
+    assert value[u'files'][0][u'path'] == [u'61', u'62']
+
+
+def test_to_json_file():
+    """Ensure files (and paths) are transcoded."""
+    expected = {u'foo': 42, u'bar': {u'sketch': u'parrot', u'foobar': 23}}
+
+    assert json.loads(to_json(os.path.join(FIXTURE_DIR, 'alpha'))) == expected
+
+    with open(os.path.join(FIXTURE_DIR, 'alpha'), 'rb') as fp:
+        output = io.StringIO()
+        to_json(fp, output)
+
+        assert json.loads(output.getvalue()) == expected
+
+    assert json.loads(to_json(io.BytesIO(bencode(VALUE))))[u'empty'] == []
+
+
+def test_to_json_scalar():
+    """Ensure top-level values that aren't containers are transcoded."""
+    assert to_json(bytearray(b'i42e')) == u'42'
+    assert to_json(bytearray(b'4:spam'), ensure_ascii=False) == u'"spam"'
+
+
+def test_to_json_errors():
+    """Ensure invalid values raise an exception."""
+    for value in [b'', b'd3:fooe', b'di1ei2ee', b'l4:spa', b'i1ei2e', b'x']:
+        with pytest.raises(BencodeDecodeError):
+            to_json(bytearray(value))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 65536])
+def test_transcode_events(chunk_size):
+    """Ensure events of streams are transcoded (matching transcoded buffers)."""
+    decoder = BencodeDecoder(encoding_rules={'name': 'bytes', 'path': 'bytes'})
+    transcoder = JsonTranscoder(decoder, binary='hex')
+
+    for value in [VALUE, 42, b'spam', [[], {}], {b'a': [{b'b': [1]}]}]:
+        x = bencode(value)
+        events = iterparse(io.BytesIO(x), decoder, chunk_size=chunk_size)
+
+        assert transcoder.transcode_events(events) == transcoder.transcode(bytearray(x))
+
+    with pytest.raises(BencodeDecodeError):
+        transcoder.transcode_events(iterparse(io.BytesIO(b'd3:fooe'), chunk_size=chunk_size))